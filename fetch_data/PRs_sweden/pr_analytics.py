@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from involvement import involvement_flags
+from username_ids import UsernameIds
+
+# Aggregations behind analyze_swedish_PRs.py.
+#
+# The YES/NO columns are turned into booleans once (with involvement's
+# helper, like the filter scripts), the author checks against
+# the Swedish user lists become boolean columns too, and every per-timeframe
+# (or per-timeframe and repository) count then comes out of a single groupby
+# with named aggregations. Author checks run on the shared integer user IDs of
+# username_ids. The report sections and the plot all read from that one
+# summary frame instead of re-filtering the PR table.
+
+FLAG_COLUMNS = {
+    "opened": "Opened by Swedish",
+    "commented": "Commented by Swedish",
+    "reviewed": "Reviewed by Swedish",
+}
+
+# Time frame whose Swedish users are checked against the authors of every time frame
+FOCUS_TIME_FRAME = "2020_2022"
+
+
+def pr_flags(pr_df, users_df, focus_time_frame=FOCUS_TIME_FRAME):
+    """Boolean columns for every check the report makes on a PR"""
+    # Same YES/NO conversion as the filter scripts, under the short names
+    flags = involvement_flags(pr_df, list(FLAG_COLUMNS.values()))
+    flags = flags.rename(columns={column: name for name, column in FLAG_COLUMNS.items()})
+    flags["swedish"] = flags[list(FLAG_COLUMNS)].any(axis=1)
+
+    # Usernames become shared integer IDs, unknown authors get MISSING_ID
+    username_ids = UsernameIds()
+    users = users_df.dropna(subset=["Username"])
+    user_ids = username_ids.encode(users["Username"])
+    author_ids = username_ids.encode(pr_df["Author"], assign=False)
+
+    # Authored by a Swedish user identified in the PR's own time frame
+    user_pairs = pd.MultiIndex.from_arrays([users["Time Frame"], user_ids])
+    flags["authored"] = pd.MultiIndex.from_arrays([pr_df["Time Frame"], author_ids]).isin(user_pairs)
+    flags["unmarked"] = flags["authored"] & ~flags["opened"]
+
+    # Authored by one of the focus time frame's Swedish users
+    focus_ids = user_ids[users["Time Frame"] == focus_time_frame].unique()
+    flags["focus_authored"] = author_ids.isin(focus_ids)
+    return flags
+
+
+def summarize(pr_df, flags, by=("Time Frame",)):
+    """Every count of the report per group, in one groupby"""
+    keys = [pr_df[column] for column in by]
+    summary = flags.groupby(keys, sort=False).agg(
+        total_prs=("swedish", "size"),
+        swedish_prs=("swedish", "sum"),
+        opened_prs=("opened", "sum"),
+        commented_prs=("commented", "sum"),
+        reviewed_prs=("reviewed", "sum"),
+        authored_prs=("authored", "sum"),
+        unmarked_prs=("unmarked", "sum"),
+        focus_authored_prs=("focus_authored", "sum"),
+    )
+    summary["swedish_share"] = summary["swedish_prs"] / summary["total_prs"] * 100
+    return summary
+
+
+def users_per_time_frame(users_df):
+    """Number of Swedish users (rows) and distinct usernames per time frame"""
+    return users_df.groupby("Time Frame", sort=False).agg(
+        users=("Time Frame", "size"),
+        distinct_users=("Username", "nunique"),
+    )
+
+
+def plot_frame(summary):
+    """Long-format counts per time frame and contribution type for the bar plot"""
+    columns = {
+        "opened_prs": FLAG_COLUMNS["opened"],
+        "commented_prs": FLAG_COLUMNS["commented"],
+        "reviewed_prs": FLAG_COLUMNS["reviewed"],
+    }
+    plot_df = summary[list(columns)].rename(columns=columns).sort_index()
+    plot_df = plot_df.rename_axis("Time Frame").reset_index()
+    return plot_df.melt(id_vars="Time Frame", var_name="Type", value_name="Count")
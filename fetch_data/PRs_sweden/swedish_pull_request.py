@@ -1,41 +1,31 @@
-import aiohttp
 import asyncio
-import json
 import os
+import sys
 import time
 import pandas as pd
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {
-    "Authorization": f"token {TOKEN}" if TOKEN else "",
-    "Accept": "application/vnd.github.v3+json"
-}
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cache_store import open_cache
+from checkpoint import Checkpoint
+from contributions import PR_COLUMNS, REPOSITORIES, TIME_FRAMES, pr_details as summarize_pr, pr_row, save_table
+from contributor_index import ContributorIndex
+from github_client import GitHubClient
+from github_search import search_created_window, scan_by_created, scan_updated_since
+from github_graphql import search_merged_prs
+from incremental import INCREMENTAL, Watermarks, latest, merge_rows
 
-# Define repositories
-repositories = [
-    ("vuejs", "vue"),
-    ("electron", "electron"),
-    ("freeCodeCamp", "freeCodeCamp"),
-    ("kubernetes", "kubernetes"),
-    ("n8n-io", "n8n"),
-    ("pytorch", "pytorch"),
-    ("facebook", "react"),
-    ("apache", "superset"),
-    ("tensorflow", "tensorflow"),
-    ("microsoft", "vscode"),
-    ("ytdl-org", "youtube-dl"),
-]
+# "graphql" fetches pages of PRs with their comments and reviews in one query,
+# "rest" lists PRs and fetches comments/reviews with two calls per PR
+PR_BACKEND = os.getenv("PR_BACKEND", "graphql")
 
-# Time periods
-time_frames = [
-    ("2018-01-01T00:00:00Z", "2019-12-31T23:59:59Z", "2018_2019"),
-    ("2020-01-01T00:00:00Z", "2022-06-30T23:59:59Z", "2020_2022"),
-    ("2022-06-01T00:00:00Z", "2024-06-30T23:59:59Z", "2022_2024"),
-]
+# REST backend only: "search" uses the Search API with a created:since..until
+# window, "scan" pages through the closed PR list sorted by created date
+FETCH_MODE = os.getenv("FETCH_MODE", "search")
+
+# Repositories and time periods, shared with issues.py and event_crawler.py
+repositories = REPOSITORIES
+time_frames = TIME_FRAMES
 
 # Load Swedish users
 swedish_users = set()
@@ -46,156 +36,171 @@ if os.path.exists(filename):
 
 print(f"✅ Loaded {len(swedish_users)} unique Swedish contributors.")
 
-# Load cached PR data
-cache_file = "cached_prs.json"
-if os.path.exists(cache_file):
-    with open(cache_file, "r", encoding="utf-8") as f:
-        cached_pr_data = json.load(f)
-else:
-    cached_pr_data = {}
-
-print(f"📁 Loaded {len(cached_pr_data)} cached PR records.")
-
-# Create detailed cache file for individual PRs
-detailed_cache_file = "cached_pr_details.json"
-if os.path.exists(detailed_cache_file):
-    with open(detailed_cache_file, "r", encoding="utf-8") as f:
-        cached_pr_details = json.load(f)
-else:
-    cached_pr_details = {}
+# Cached PR rows per repo/timeframe and details per PR, stored in SQLite.
+# The old JSON cache files are migrated into the store on the first run.
+cached_pr_data = open_cache("prs", "cached_prs.json")
+print(f"📁 Loaded cache with {len(cached_pr_data)} PR records.")
 
-print(f"📁 Loaded {len(cached_pr_details)} cached PR details.")
+cached_pr_details = open_cache("pr_details", "cached_pr_details.json")
+print(f"📁 Loaded cache with {len(cached_pr_details)} PR details.")
 
-# Rate limit tracking
-rate_limit_remaining = 5000
-rate_limit_reset_time = 0
-
-async def check_rate_limit(session):
-    """Check GitHub API rate limit status"""
-    global rate_limit_remaining, rate_limit_reset_time
-    
-    try:
-        async with session.get("https://api.github.com/rate_limit") as response:
-            if response.status == 200:
-                data = await response.json()
-                rate_limit_remaining = data["resources"]["core"]["remaining"]
-                rate_limit_reset_time = data["resources"]["core"]["reset"]
-                
-                print(f"🔄 Rate limit remaining: {rate_limit_remaining}")
-                return rate_limit_remaining
-            else:
-                print(f"⚠️ Failed to check rate limit: {response.status}")
-                return 0
-    except Exception as e:
-        print(f"⚠️ Error checking rate limit: {e}")
-        return 0
+# Raw authors/commenters/reviewers per PR, for flagging other cohorts offline
+contributor_index = ContributorIndex()
 
-async def wait_for_rate_limit(session):
-    """Wait if rate limit is approaching zero"""
-    await check_rate_limit(session)
-    
-    if rate_limit_remaining < 10:
-        current_time = time.time()
-        sleep_time = max(rate_limit_reset_time - current_time + 10, 0)
-        
-        if sleep_time > 0:
-            print(f"🚨 Rate limit almost reached! Sleeping for {sleep_time:.1f} seconds")
-            await asyncio.sleep(sleep_time)
-            await check_rate_limit(session)
+# High-water marks for incremental refreshes
+watermarks = Watermarks()
 
-async def fetch_prs_for_timeframe(session, owner, repo, since, until, timeframe):
+async def fetch_prs_for_timeframe(client, owner, repo, since, until, timeframe):
     """Fetch PRs for a specific repository and timeframe"""
     cache_key = f"{owner}_{repo}_{timeframe}"
+    watermark = watermarks.get("prs", owner, repo, timeframe)
     
     # Check if we have this data cached
-    if cache_key in cached_pr_data:
+    if cache_key in cached_pr_data and (not INCREMENTAL or watermark is None):
+        # Without a high-water mark (e.g. migrated caches) there is nothing to refresh from
         print(f"⚡ Using cached data for {owner}/{repo} ({timeframe})")
         return cached_pr_data[cache_key]
     
-    print(f"🔍 Fetching PRs for {owner}/{repo} ({timeframe})...")
+    # Incremental refresh: only PRs updated since the last run
+    updated_since = None
+    if INCREMENTAL and watermark and cache_key in cached_pr_data:
+        updated_since = watermark.get("updated_at")
     
-    # Use API date filtering to reduce the number of PRs fetched
-    # 'since' parameter filters by updated date, not created date, so we'll still filter in code
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-    params = {
-        "state": "closed",
-        "per_page": 100,
-        "sort": "updated",
-        "direction": "desc"
-    }
+    # Resume an interrupted crawl of this timeframe from its last finished page
+    checkpoint = Checkpoint(f"prs:{owner}/{repo}:{timeframe}")
+    meta = checkpoint.meta()
+    if meta and meta["backend"] == PR_BACKEND and meta["mode"] == FETCH_MODE:
+        updated_since = meta["updated_since"]
+        oldest, newest = checkpoint.created_span()
+        # The REST scan modes continue from the API page after the last finished one
+        position = {"page": meta.get("api_page", 1)}
+        print(f"⏯️ Resuming PRs for {owner}/{repo} ({timeframe}) after {len(checkpoint.rows())} saved PRs...")
+    else:
+        checkpoint.clear()
+        checkpoint.start(backend=PR_BACKEND, mode=FETCH_MODE, updated_since=updated_since)
+        oldest = newest = None
+        position = {"page": 1}
+        if updated_since:
+            print(f"🔄 Refreshing PRs for {owner}/{repo} ({timeframe}) updated since {updated_since}...")
+        else:
+            print(f"🔍 Fetching PRs for {owner}/{repo} ({timeframe})...")
     
-    all_prs = []
-    page = 1
-    stop_fetching = False
+    updated_qualifier = f"updated:>={updated_since}" if updated_since else ""
+    if PR_BACKEND == "graphql":
+        # Pages of merged PRs that already include comment and review authors, oldest first
+        pages = search_merged_prs(client, owner, repo, newest or since, until, updated_qualifier)
+    elif FETCH_MODE == "search":
+        # Only merged PRs created inside the window, split to stay under the search cap
+        query = f"repo:{owner}/{repo} is:pr is:merged {updated_qualifier}".strip()
+        pages = search_created_window(client, query, newest or since, until)
+    elif updated_since:
+        # Closed PRs sorted by updated date, stop once we pass the high-water mark
+        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+        pages = scan_updated_since(client, url, since, until, updated_since, params={"state": "closed"}, position=position)
+    else:
+        # Closed PRs sorted by created date (newest first), stop once we pass the start of the window
+        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+        pages = scan_by_created(client, url, since, oldest or until, params={"state": "closed"}, position=position)
     
-    while not stop_fetching:
-        await wait_for_rate_limit(session)
-        
-        try:
-            current_params = {**params, "page": page}
-            async with session.get(url, params=current_params) as response:
-                if response.status == 200:
-                    prs = await response.json()
-                    
-                    if not prs:
-                        break  # No more data
-                    
-                    # Process PRs and check if we've gone past our time window
-                    all_before_timeframe = True
-                    
-                    for pr in prs:
-                        created_at = pr["created_at"]
-                        
-                        # If PR was created before our time frame, skip it
-                        if created_at < since:
-                            continue
-                            
-                        # If PR was created after our time frame, skip it
-                        if created_at > until:
-                            continue
-                            
-                        all_before_timeframe = False
-                        
-                        # Process this PR
-                        pr_data = await process_pr(session, owner, repo, pr, timeframe)
-                        if pr_data:
-                            all_prs.append(pr_data)
-                    
-                    # If all PRs in this page are before our time frame, we can stop
-                    if all_before_timeframe and page > 1:
-                        stop_fetching = True
-                    else:
-                        page += 1
-                        
-                elif response.status == 403:
-                    # Rate limited
-                    retry_after = int(response.headers.get("Retry-After", "60"))
-                    print(f"🚨 Rate limited! Waiting for {retry_after} seconds...")
-                    await asyncio.sleep(retry_after)
-                    
-                else:
-                    print(f"❌ Failed to fetch PRs: {response.status}")
-                    break
-                    
-        except Exception as e:
-            print(f"❌ Error fetching PRs: {e}")
-            await asyncio.sleep(5)  # Short delay on error
+    all_prs = checkpoint.rows()
+    done = {row[2] for row in all_prs}
+    page_number = checkpoint.next_page()
+    # PRs that changed since the last run need their details refetched
+    refresh = updated_since is not None
+    
+    try:
+        async for page_prs in pages:
+            # PRs on the boundary of a resumed window were already saved
+            page_prs = [pr for pr in page_prs if pr["number"] not in done]
+            if not page_prs:
+                continue
+            
+            if PR_BACKEND == "graphql":
+                rows = [process_graphql_pr(owner, repo, pr, timeframe, refresh) for pr in page_prs]
+            else:
+                # Process all PRs on this page concurrently
+                results = await asyncio.gather(
+                    *(process_pr(client, owner, repo, pr, timeframe, refresh) for pr in page_prs)
+                )
+                rows = [pr_data for pr_data in results if pr_data]
+            
+            # Details first, then the page, so a resumed run never points at missing details
+            cached_pr_details.flush()
+            contributor_index.flush()
+            created = [pr["created_at"] for pr in page_prs]
+            checkpoint.commit_page(
+                page_number, rows,
+                oldest=min(created), newest=max(created),
+                updated_at=latest(pr.get("updated_at") for pr in page_prs)
+            )
+            checkpoint.update(api_page=position["page"])
+            page_number += 1
+            all_prs.extend(rows)
+            done.update(pr["number"] for pr in page_prs)
+            
+    except Exception as e:
+        # Leave the cache and mark alone, the next run resumes from the checkpoint
+        raise RuntimeError(f"Error fetching PRs for {owner}/{repo} ({timeframe}), rerun to resume: {e}") from e
+    
+    latest_update = latest(entry.get("updated_at") for _, entry in checkpoint.pages())
+    
+    if updated_since:
+        # Merge the changed PRs into the cached rows, keyed by PR number
+        all_prs = merge_rows(cached_pr_data.get(cache_key, []), all_prs, key_index=2)
+        print(f"✅ {owner}/{repo} ({timeframe}): refreshed, {len(all_prs)} PRs in total")
     
     # Cache the results for this timeframe
     cached_pr_data[cache_key] = all_prs
-    with open(cache_file, "w", encoding="utf-8") as f:
-        json.dump(cached_pr_data, f)
+    cached_pr_data.flush()
+    watermarks.advance("prs", owner, repo, timeframe, updated_at=latest_update)
+    checkpoint.clear()
     
     return all_prs
 
-async def process_pr(session, owner, repo, pr, timeframe):
-    """Process a single PR and fetch its details"""
-    global cached_pr_details
+def pr_merged_at(pr):
+    """Merge date of a PR, Search API results carry it inside the pull_request object"""
+    return pr.get("merged_at") or (pr.get("pull_request") or {}).get("merged_at")
+
+def store_pr_details(owner, repo, pr, commenters, reviewers):
+    """Summarize a PR's commenters/reviewers and store the result in the details cache"""
+    pr_details = summarize_pr(pr["title"], pr["created_at"], pr_merged_at(pr), commenters, reviewers, swedish_users)
+    
+    cached_pr_details[f"{owner}_{repo}_{pr['number']}"] = pr_details
+    index_participants(repo, pr, commenters, reviewers)
+    
+    return pr_details
+
+def index_participants(repo, pr, commenters, reviewers):
+    """Record a PR's author, commenters and reviewers in the contributor index"""
+    author = pr["user"]["login"] if pr["user"] else None
+    contributor_index.record("pr", repo, pr["number"], author, commenters, reviewers)
+
+def process_graphql_pr(owner, repo, pr, timeframe, refresh=False):
+    """Process a PR from the GraphQL backend, which already has its commenters and reviewers"""
+    author = pr["user"]["login"] if pr["user"] else "ghost"
+    pr_cache_key = f"{owner}_{repo}_{pr['number']}"
+    
+    if pr_cache_key in cached_pr_details and not refresh:
+        # The participants were downloaded anyway, index them even for cached PRs
+        # (e.g. ones cached before the index existed)
+        pr_details = cached_pr_details[pr_cache_key]
+        index_participants(repo, pr, pr["commenters"], pr["reviewers"])
+    else:
+        pr_details = store_pr_details(owner, repo, pr, pr["commenters"], pr["reviewers"])
     
+    return pr_row(timeframe, repo, pr["number"], author, pr_details, swedish_users)
+
+async def fetch_user_logins(client, url):
+    """Fetch every page of a list of comments/reviews and return the set of their authors"""
+    # Raises if a page fails, a partial set would be cached as the PR's participants
+    items = await client.get_all(url)
+    return {item["user"]["login"] for item in items if item.get("user") and item["user"].get("login")}
+
+async def process_pr(client, owner, repo, pr, timeframe, refresh=False):
+    """Process a single PR and fetch its details (refetching cached ones if refresh is set)"""
     pr_number = pr["number"]
     author = pr["user"]["login"] if pr["user"] else "ghost"
-    created_at = pr["created_at"]
-    merged_at = pr["merged_at"]
+    merged_at = pr_merged_at(pr)
     
     # Skip PRs that weren't merged
     if not merged_at:
@@ -205,152 +210,80 @@ async def process_pr(session, owner, repo, pr, timeframe):
     pr_cache_key = f"{owner}_{repo}_{pr_number}"
     
     # Check if we already have cached data for this PR
-    if pr_cache_key in cached_pr_details:
-        pr_details = cached_pr_details[pr_cache_key]
-        
-        # Return formatted data for this PR
-        return [
-            timeframe,
-            repo,
-            pr_number,
-            pr_details["title"],
-            author,
-            "YES" if author in swedish_users else "NO",
-            pr_details["comment_count"],
-            "YES" if pr_details["commented_by_swedish"] else "NO",
-            pr_details["review_count"],
-            "YES" if pr_details["reviewed_by_swedish"] else "NO",
-            pr_details["merge_time"]
-        ]
-    
-    # Fetch PR details using GraphQL for efficiency (gets comments and reviews in one request)
-    await wait_for_rate_limit(session)
+    if pr_cache_key in cached_pr_details and not refresh:
+        return pr_row(timeframe, repo, pr_number, author, cached_pr_details[pr_cache_key], swedish_users)
     
     try:
         # Use the REST API to fetch comments and reviews
         comments_url = f"https://api.github.com/repos/{owner}/{repo}/issues/{pr_number}/comments"
         reviews_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
         
-        # Fetch comments
-        commenters = set()
-        async with session.get(comments_url) as comments_response:
-            if comments_response.status == 200:
-                comments = await comments_response.json()
-                for comment in comments:
-                    if comment.get("user") and comment["user"].get("login"):
-                        commenters.add(comment["user"]["login"])
-        
-        # Fetch reviews
-        reviewers = set()
-        async with session.get(reviews_url) as reviews_response:
-            if reviews_response.status == 200:
-                reviews = await reviews_response.json()
-                for review in reviews:
-                    if review.get("user") and review["user"].get("login"):
-                        reviewers.add(review["user"]["login"])
-        
-        # Check if any Swedish user commented or reviewed
-        commented_by_swedish = any(user in swedish_users for user in commenters)
-        reviewed_by_swedish = any(user in swedish_users for user in reviewers)
-        
-        # Calculate time to merge
-        if merged_at:
-            created_time = pd.to_datetime(created_at)
-            merged_time = pd.to_datetime(merged_at)
-            merge_time = (merged_time - created_time).days
-        else:
-            merge_time = "Not Merged"
+        # Fetch comments and reviews at the same time
+        commenters, reviewers = await asyncio.gather(
+            fetch_user_logins(client, comments_url),
+            fetch_user_logins(client, reviews_url)
+        )
         
-        # Store PR details in cache
-        pr_details = {
-            "title": pr["title"],
-            "comment_count": len(commenters),
-            "commented_by_swedish": commented_by_swedish,
-            "review_count": len(reviewers),
-            "reviewed_by_swedish": reviewed_by_swedish,
-            "merge_time": merge_time
-        }
-        
-        cached_pr_details[pr_cache_key] = pr_details
-        
-        # Periodically save the cached details
-        if len(cached_pr_details) % 10 == 0:
-            with open(detailed_cache_file, "w", encoding="utf-8") as f:
-                json.dump(cached_pr_details, f)
-        
-        # Return formatted data for this PR
-        return [
-            timeframe,
-            repo,
-            pr_number,
-            pr["title"],
-            author,
-            "YES" if author in swedish_users else "NO",
-            len(commenters),
-            "YES" if commented_by_swedish else "NO",
-            len(reviewers),
-            "YES" if reviewed_by_swedish else "NO",
-            merge_time
-        ]
+        pr_details = store_pr_details(owner, repo, pr, commenters, reviewers)
+        return pr_row(timeframe, repo, pr_number, author, pr_details, swedish_users)
         
     except Exception as e:
-        print(f"❌ Error processing PR {pr_number}: {e}")
-        return None
+        # Propagate, so the page is not checkpointed and the next run fetches it again
+        raise RuntimeError(f"Error processing PR {pr_number}: {e}") from e
 
 async def main():
     """Main function to orchestrate the fetching and processing of data"""
     pr_data = []
     total_tasks = len(repositories) * len(time_frames)
     completed_tasks = 0
+    failed_units = []
     
-    # Create async session
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        # Check rate limit before starting
-        await check_rate_limit(session)
-        
-        # Process repositories in parallel with concurrency control
-        # Use a semaphore to limit concurrent requests
-        semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent repositories
-        
-        async def process_with_semaphore(owner, repo, since, until, timeframe):
-            async with semaphore:
-                return await fetch_prs_for_timeframe(session, owner, repo, since, until, timeframe)
+    # Create the shared GitHub client (tracks rate limits from response headers)
+    # All repositories and timeframes run at once, the client's in-flight limit
+    # (GITHUB_MAX_IN_FLIGHT) is what bounds the number of concurrent requests
+    async with GitHubClient() as client:
+        # A failed unit is reported instead of raised, so the others still finish
+        async def fetch_unit(owner, repo, since, until, timeframe):
+            try:
+                return repo, timeframe, await fetch_prs_for_timeframe(client, owner, repo, since, until, timeframe)
+            except Exception as e:
+                return repo, timeframe, e
         
         # Create tasks
         tasks = []
         for owner, repo in repositories:
             for since, until, timeframe in time_frames:
-                task = process_with_semaphore(owner, repo, since, until, timeframe)
+                task = fetch_unit(owner, repo, since, until, timeframe)
                 tasks.append(task)
         
         # Execute tasks with progress tracking
         for i, task in enumerate(asyncio.as_completed(tasks)):
-            try:
-                repo_data = await task
-                pr_data.extend(repo_data)
-                completed_tasks += 1
-                progress = (completed_tasks / total_tasks) * 100
-                print(f"⏳ Progress: {progress:.2f}% ({completed_tasks}/{total_tasks} tasks completed)")
-            except Exception as e:
-                print(f"❌ Task error: {e}")
+            repo, timeframe, repo_data = await task
+            if isinstance(repo_data, Exception):
+                print(f"❌ Task error: {repo_data}")
+                failed_units.append((repo, timeframe))
+                continue
+            pr_data.extend(repo_data)
+            completed_tasks += 1
+            progress = (completed_tasks / total_tasks) * 100
+            print(f"⏳ Progress: {progress:.2f}% ({completed_tasks}/{total_tasks} tasks completed)")
     
-    # Save the final cached PR details
-    with open(detailed_cache_file, "w", encoding="utf-8") as f:
-        json.dump(cached_pr_details, f)
+    # Commit the last batch of cached PR details
+    cached_pr_details.flush()
+    contributor_index.flush()
     
     # Convert to DataFrame
-    df_prs = pd.DataFrame(pr_data, columns=[
-        "Time Frame", "Repository", "PR Number", "PR Title", "Author",
-        "Opened by Swedish", "Total Comments", "Commented by Swedish",
-        "Total Reviews", "Reviewed by Swedish", "Merge Time (Days)"
-    ])
+    df_prs = pd.DataFrame(pr_data, columns=PR_COLUMNS)
     
-    # Save the results to CSV
+    # Save the results to CSV, failed units keep the rows of the previous run
     output_file = "swedish_contributor_prs.csv"
-    df_prs.to_csv(output_file, index=False)
+    save_table(df_prs, output_file, failed_units)
     
     print(f"\n✅ Data saved to {output_file}")
     print(f"📊 Total PRs analyzed: {len(df_prs)}")
+    
+    if failed_units:
+        raise SystemExit(f"❌ {len(failed_units)} of {total_tasks} tasks failed, rerun to resume them")
 
 # Run the async main function
 if __name__ == "__main__":
@@ -366,6 +299,9 @@ if __name__ == "__main__":
         
     except KeyboardInterrupt:
         print("\n⛔ Script interrupted by user")
+        # Exit non-zero, so the pipeline does not record a partial crawl as done
+        sys.exit(130)
         
     except Exception as e:
-        print(f"\n💥 Script error: {e}")
\ No newline at end of file
+        print(f"\n💥 Script error: {e}")
+        sys.exit(1)
\ No newline at end of file
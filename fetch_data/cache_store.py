@@ -0,0 +1,255 @@
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Keyed on-disk cache used instead of the big JSON cache files.
+#
+# Every cache is one table in a shared SQLite database (CACHE_DB, default
+# github_cache.sqlite). Reads and writes are point lookups by key, so startup
+# time and memory do not grow with the cache. Writes are buffered and committed
+# in batches, one transaction per batch, and the database runs in WAL mode so a
+# crash only ever loses the batch that was not committed yet.
+#
+# BatchWriter is the single writer for async producers: they queue entries
+# without blocking, and one task commits them in batches on a size/time policy
+# from a separate thread and connection, so saving never stalls the lookups.
+
+DB_FILE = os.getenv("CACHE_DB", "github_cache.sqlite")
+
+# Legacy JSON cache files and the tables they are migrated into
+JSON_CACHES = {
+    "cached_prs.json": "prs",
+    "cached_pr_details.json": "pr_details",
+    "cached_issues.json": "issues",
+    "cached_issue_details.json": "issue_details",
+    "github_locations_cache.json": "user_locations",
+}
+
+_connections = {}
+
+
+def open_connection(path, **kwargs):
+    connection = sqlite3.connect(path, **kwargs)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def connect(path=DB_FILE):
+    """Open (once per process) the SQLite database at path"""
+    if path not in _connections:
+        _connections[path] = open_connection(path)
+    return _connections[path]
+
+
+def write_items(connection, table, items):
+    """Write many key/value pairs into a table in a single transaction"""
+    with connection:
+        connection.executemany(
+            f"INSERT OR REPLACE INTO {table} (key, value) VALUES (?, ?)",
+            ((key, json.dumps(value)) for key, value in items)
+        )
+
+
+class CacheStore:
+    """Dict-like JSON key/value cache backed by one SQLite table"""
+
+    def __init__(self, table, path=DB_FILE, batch_size=100):
+        self.table = table
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = connect(path)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.connection.commit()
+        self.pending = {}
+
+    def __contains__(self, key):
+        if key in self.pending:
+            return True
+        row = self.connection.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def __getitem__(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        row = self.connection.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def get_many(self, keys, chunk_size=500):
+        """Look up many keys at once, returns {key: value} for the ones that exist"""
+        keys = list(dict.fromkeys(keys))
+        found = {key: self.pending[key] for key in keys if key in self.pending}
+        missing = [key for key in keys if key not in found]
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", chunk
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def __setitem__(self, key, value):
+        self.pending[key] = value
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def put_many(self, items):
+        """Write many key/value pairs in a single transaction"""
+        write_items(self.connection, self.table, items)
+
+    def flush(self):
+        """Commit all buffered writes"""
+        if self.pending:
+            self.put_many(self.pending.items())
+            self.pending = {}
+
+    def delete(self, key):
+        self.pending.pop(key, None)
+        with self.connection:
+            self.connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        self.flush()
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def keys(self):
+        self.flush()
+        for (key,) in self.connection.execute(f"SELECT key FROM {self.table}"):
+            yield key
+
+    def items(self, prefix=None):
+        """Iterate over all entries, or only the ones whose key starts with prefix"""
+        self.flush()
+        if prefix is None:
+            rows = self.connection.execute(f"SELECT key, value FROM {self.table}")
+        else:
+            # Range scan on the primary key instead of LIKE, so the index is used
+            rows = self.connection.execute(
+                f"SELECT key, value FROM {self.table} WHERE key >= ? AND key < ? ORDER BY key",
+                (prefix, prefix + "\uffff")
+            )
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def delete_prefix(self, prefix):
+        """Delete every entry whose key starts with prefix"""
+        self.flush()
+        with self.connection:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+            )
+
+
+class BatchWriter:
+    """Single writer for a CacheStore: producers queue entries with put(), one task
+    commits them once batch_size entries are waiting or interval seconds have passed"""
+
+    _STOP = object()
+
+    def __init__(self, store, batch_size=100, interval=5.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = None
+        self.task = None
+        self.written = 0
+
+    async def __aenter__(self):
+        # One thread with its own connection does all the writing
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Drain whatever is still queued before returning
+        self.queue.put_nowait(self._STOP)
+        try:
+            await self.task
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._close)
+            self.executor.shutdown()
+
+    def put(self, key, value):
+        """Queue an entry to be written, never blocks"""
+        self.queue.put_nowait((key, value))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = {}
+        deadline = None
+
+        while True:
+            timeout = max(deadline - loop.time(), 0) if batch else None
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is self._STOP:
+                break
+            if item is not None:
+                key, value = item
+                if not batch:
+                    deadline = loop.time() + self.interval
+                batch[key] = value
+
+            if batch and (len(batch) >= self.batch_size or loop.time() >= deadline):
+                await loop.run_in_executor(self.executor, self._commit, list(batch.items()))
+                batch = {}
+
+        if batch:
+            await loop.run_in_executor(self.executor, self._commit, list(batch.items()))
+
+    def _commit(self, items):
+        if self.connection is None:
+            self.connection = open_connection(self.store.path, check_same_thread=False)
+        write_items(self.connection, self.store.table, items)
+        self.written += len(items)
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def migrate_json(json_path, store):
+    """Import a legacy JSON cache file into an empty store (one-shot)"""
+    if not os.path.exists(json_path) or len(store) > 0:
+        return 0
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    store.put_many(data.items())
+    print(f"📦 Migrated {len(data)} entries from {json_path} into {store.table}")
+    return len(data)
+
+
+def open_cache(table, json_path=None):
+    """Open a cache table, migrating its legacy JSON file the first time"""
+    store = CacheStore(table)
+    if json_path:
+        migrate_json(json_path, store)
+    return store
+
+
+if __name__ == "__main__":
+    # Migrate every legacy JSON cache in the current directory
+    for json_path, table in JSON_CACHES.items():
+        store = CacheStore(table)
+        if migrate_json(json_path, store) == 0:
+            print(f"⏭️ Skipped {json_path} ({table} already has {len(store)} entries or file missing)")
@@ -0,0 +1,74 @@
+from cache_store import open_cache
+
+# Durable checkpoints for long crawls.
+#
+# A crawl unit (e.g. the PRs of one repo/timeframe) writes one checkpoint entry
+# per finished page, holding the page's partial results and a cursor that says
+# how far the crawl got. Each entry is written in its own transaction, so after
+# a crash or Ctrl-C the next run picks up from the last committed page instead
+# of page 1. The checkpoint is cleared once the unit has been fully saved.
+
+_store = None
+
+
+def checkpoint_store():
+    global _store
+    if _store is None:
+        _store = open_cache("checkpoints")
+    return _store
+
+
+class Checkpoint:
+    """Progress of one crawl unit: metadata, finished pages and their results"""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.store = checkpoint_store()
+
+    @property
+    def _meta_key(self):
+        return f"{self.unit}|meta"
+
+    def _page_key(self, page):
+        return f"{self.unit}|page|{page:08d}"
+
+    def meta(self):
+        """Parameters the crawl was started with, or None if there is no checkpoint"""
+        return self.store.get(self._meta_key)
+
+    def start(self, **meta):
+        """Record the parameters of a new crawl so a restart can reuse them"""
+        self.store[self._meta_key] = meta
+        self.store.flush()
+
+    def update(self, **meta):
+        self.start(**{**(self.meta() or {}), **meta})
+
+    def commit_page(self, page, rows=None, **state):
+        """Durably record a finished page together with its results"""
+        self.store[self._page_key(page)] = {"rows": rows or [], **state}
+        self.store.flush()
+
+    def pages(self):
+        """Finished pages in order, as (page number, entry) pairs"""
+        prefix = f"{self.unit}|page|"
+        for key, entry in self.store.items(prefix):
+            yield int(key[len(prefix):]), entry
+
+    def created_span(self):
+        """Oldest and newest created_at over all finished pages, or (None, None)"""
+        entries = [entry for _, entry in self.pages()]
+        oldest = [entry["oldest"] for entry in entries if entry.get("oldest")]
+        newest = [entry["newest"] for entry in entries if entry.get("newest")]
+        return min(oldest, default=None), max(newest, default=None)
+
+    def next_page(self):
+        """Number to use for the next finished page"""
+        return max((page for page, _ in self.pages()), default=0) + 1
+
+    def rows(self):
+        """Partial results of every finished page"""
+        return [row for _, entry in self.pages() for row in entry["rows"]]
+
+    def clear(self):
+        self.store.delete_prefix(f"{self.unit}|")
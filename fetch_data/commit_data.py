@@ -0,0 +1,175 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Loading and aggregating the commit data written by fetch.py.
+#
+# All commit files of all repositories are read into one frame with `repo` and
+# `timeframe` as categoricals, usernames are normalized once for the whole
+# frame, and the per-author commit counts come out of a single groupby, so the
+# cost grows with the number of commits and not with the number of repos.
+#
+# When pyarrow is installed the commits are also kept as a Parquet dataset
+# (COMMITS_DATASET, partitioned as repo=<repo>/timeframe=<label>) with typed
+# columns: a datetime Date and categorical Author/Username. Readers only load
+# the columns and partitions they ask for. Without pyarrow, or for partitions
+# that were never exported or are older than their CSV, the per-timeframe CSVs
+# are read instead.
+# `python commit_data.py` exports all existing CSVs into the dataset.
+
+COMMITS_DATASET = os.getenv("COMMITS_DATASET", "commits_dataset")
+
+COMMIT_COLUMNS = ["SHA", "Message", "Author", "Username", "Date"]
+
+REPOS = ['electron', 'freecodecamp', 'kubernetes', 'n8n', 'pytorch', 'react', 'superset', 'tensorflow', 'vscode', 'vue', 'youtube']
+
+# Rows per chunk when streaming a single column out of a commits CSV
+CHUNK_SIZE = int(os.getenv("COMMITS_CHUNK_SIZE", "50000"))
+
+TIMEFRAMES = ["2018_2019", "2020_2022", "2022_2024"]
+
+# Output column for the commit count of each timeframe
+COUNT_COLUMNS = {
+    "2018_2019": "pre_pandemic_commits",
+    "2020_2022": "pandemic_commits",
+    "2022_2024": "post_pandemic_commits",
+}
+
+
+def commit_path(repo, timeframe):
+    return f"{repo}/{repo}_results/commits_{timeframe}_{repo}.csv"
+
+
+def normalize_usernames(usernames):
+    return usernames.str.lower().str.strip()
+
+
+def partition_path(repo, timeframe, root=COMMITS_DATASET):
+    return os.path.join(root, f"repo={repo}", f"timeframe={timeframe}", "part-0.parquet")
+
+
+def has_fresh_partition(repo, timeframe, root=COMMITS_DATASET):
+    """Whether a repo/timeframe partition exists and is at least as new as its CSV.
+    A CSV rewritten after the last export (by any writer) is read instead"""
+    if pa is None:
+        return False
+    path = partition_path(repo, timeframe, root)
+    if not os.path.exists(path):
+        return False
+    csv_path = commit_path(repo, timeframe)
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def has_parquet(repo, root=COMMITS_DATASET):
+    """Whether every timeframe of a repo has an up-to-date partition in the dataset"""
+    return all(has_fresh_partition(repo, timeframe, root) for timeframe in TIMEFRAMES)
+
+
+def typed_commits(commits):
+    """Commit columns with their proper types instead of plain strings"""
+    commits = commits[COMMIT_COLUMNS].copy()
+    commits["Date"] = pd.to_datetime(commits["Date"], utc=True)
+    commits["Author"] = commits["Author"].astype("category")
+    commits["Username"] = commits["Username"].astype("category")
+    return commits
+
+
+def write_partition(commits, repo, timeframe, root=COMMITS_DATASET):
+    """Replace the repo/timeframe partition of the dataset with these commits"""
+    path = partition_path(repo, timeframe, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = pa.Table.from_pandas(typed_commits(commits), preserve_index=False)
+    # Write next to the partition first, dataset discovery skips dot files
+    tmp_path = os.path.join(os.path.dirname(path), ".part-0.parquet.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def export_csv(csv_path, repo, timeframe, root=COMMITS_DATASET):
+    """Write a commits CSV into its partition of the dataset"""
+    write_partition(pd.read_csv(csv_path), repo, timeframe, root)
+
+
+def read_parquet_commits(repos, columns=("Username",), timeframes=TIMEFRAMES, root=COMMITS_DATASET):
+    """Read only the given columns of the given repo/timeframe partitions"""
+    partitioning = ds.partitioning(pa.schema([("repo", pa.string()), ("timeframe", pa.string())]), flavor="hive")
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    # The filter is on partition keys, so files of other partitions are never opened
+    table = dataset.to_table(
+        columns=list(columns) + ["repo", "timeframe"],
+        filter=ds.field("repo").isin(list(repos)) & ds.field("timeframe").isin(list(timeframes))
+    )
+    return table.to_pandas()
+
+
+def load_repo_commits(repo, columns=("Username",)):
+    """Commits of every timeframe of one repo, raises if a file is missing"""
+    if has_parquet(repo):
+        return read_parquet_commits([repo], columns)
+
+    frames = []
+    for timeframe in TIMEFRAMES:
+        frame = pd.read_csv(commit_path(repo, timeframe), usecols=list(columns))
+        frame["timeframe"] = timeframe
+        frames.append(frame)
+    commits = pd.concat(frames, ignore_index=True)
+    commits["repo"] = repo
+    return commits
+
+
+def unique_usernames(repo, timeframe, chunksize=CHUNK_SIZE):
+    """Distinct usernames of one repo/timeframe in order of first appearance,
+    reading only the Username column so memory is bounded by the number of users"""
+    if has_fresh_partition(repo, timeframe):
+        usernames = read_parquet_commits([repo], ["Username"], [timeframe])["Username"]
+        return list(usernames.dropna().drop_duplicates())
+
+    seen = {}
+    for chunk in pd.read_csv(
+        commit_path(repo, timeframe), usecols=["Username"], dtype={"Username": str}, chunksize=chunksize
+    ):
+        seen.update(dict.fromkeys(chunk["Username"].dropna()))
+    return list(seen)
+
+
+def combine_commits(frames, repos):
+    """Concatenate per-repo commit frames and normalize usernames once"""
+    commits = pd.concat(frames, ignore_index=True)
+    commits["repo"] = pd.Categorical(commits["repo"], categories=repos)
+    commits["timeframe"] = pd.Categorical(commits["timeframe"], categories=TIMEFRAMES)
+    commits["Username"] = normalize_usernames(commits["Username"])
+    return commits
+
+
+def commit_counts(commits):
+    """Commits per repo and author, one count column per timeframe"""
+    counts = (
+        commits.groupby(["repo", "Username", "timeframe"], observed=True)
+        .size()
+        .unstack("timeframe", fill_value=0)
+        .reindex(columns=TIMEFRAMES, fill_value=0)
+        .rename(columns=COUNT_COLUMNS)
+    )
+    counts.columns.name = None
+    return counts.reset_index().astype({"repo": str})
+
+
+if __name__ == "__main__":
+    if pa is None:
+        raise SystemExit("❌ pyarrow is not installed, run `pip install pyarrow` to export the commits")
+
+    # Export every <repo>/<repo>_results/commits_<label>_<repo>.csv in the current directory
+    for repo in sorted(os.listdir(".")):
+        for timeframe in TIMEFRAMES:
+            csv_path = commit_path(repo, timeframe)
+            if os.path.exists(csv_path):
+                export_csv(csv_path, repo, timeframe)
+                print(f"📦 Exported {csv_path} to {partition_path(repo, timeframe)}")
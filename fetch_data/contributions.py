@@ -0,0 +1,116 @@
+import os
+
+import pandas as pd
+
+# Repositories, time frames and output rows shared by the PR and issue crawls
+# (PRs_sweden/swedish_pull_request.py, issues_sweden/issues.py) and by
+# event_crawler.py, so every crawler writes the same tables.
+
+REPOSITORIES = [
+    ("vuejs", "vue"),
+    ("electron", "electron"),
+    ("freeCodeCamp", "freeCodeCamp"),
+    ("kubernetes", "kubernetes"),
+    ("n8n-io", "n8n"),
+    ("pytorch", "pytorch"),
+    ("facebook", "react"),
+    ("apache", "superset"),
+    ("tensorflow", "tensorflow"),
+    ("microsoft", "vscode"),
+    ("ytdl-org", "youtube-dl"),
+]
+
+# (since, until, label), 2020_2022 and 2022_2024 overlap in June 2022
+TIME_FRAMES = [
+    ("2018-01-01T00:00:00Z", "2019-12-31T23:59:59Z", "2018_2019"),
+    ("2020-01-01T00:00:00Z", "2022-06-30T23:59:59Z", "2020_2022"),
+    ("2022-06-01T00:00:00Z", "2024-06-30T23:59:59Z", "2022_2024"),
+]
+
+PR_COLUMNS = [
+    "Time Frame", "Repository", "PR Number", "PR Title", "Author",
+    "Opened by Swedish", "Total Comments", "Commented by Swedish",
+    "Total Reviews", "Reviewed by Swedish", "Merge Time (Days)"
+]
+
+ISSUE_COLUMNS = [
+    "Time Frame", "Repository", "Issue Number", "Issue Title", "Author",
+    "Opened by Swedish", "Total Comments", "Commented by Swedish",
+    "Resolution Time (Days)"
+]
+
+
+def days_between(start, end):
+    return (pd.to_datetime(end) - pd.to_datetime(start)).days
+
+
+def pr_details(title, created_at, merged_at, commenters, reviewers, swedish_users):
+    """Summary of a PR as stored in the details cache"""
+    return {
+        "title": title,
+        "comment_count": len(commenters),
+        "commented_by_swedish": any(user in swedish_users for user in commenters),
+        "review_count": len(reviewers),
+        "reviewed_by_swedish": any(user in swedish_users for user in reviewers),
+        "merge_time": days_between(created_at, merged_at) if merged_at else "Not Merged"
+    }
+
+
+def pr_row(timeframe, repo, pr_number, author, pr_details, swedish_users):
+    """Format a PR and its details as an output row"""
+    return [
+        timeframe,
+        repo,
+        pr_number,
+        pr_details["title"],
+        author,
+        "YES" if author in swedish_users else "NO",
+        pr_details["comment_count"],
+        "YES" if pr_details["commented_by_swedish"] else "NO",
+        pr_details["review_count"],
+        "YES" if pr_details["reviewed_by_swedish"] else "NO",
+        pr_details["merge_time"]
+    ]
+
+
+def issue_details(title, created_at, closed_at, commenters, swedish_users):
+    """Summary of an issue as stored in the details cache"""
+    return {
+        "title": title,
+        "comment_count": len(commenters),
+        "commented_by_swedish": any(user in swedish_users for user in commenters),
+        "resolution_time": days_between(created_at, closed_at) if closed_at else "Not Closed"
+    }
+
+
+def issue_row(timeframe, repo, issue_number, author, issue_details, swedish_users):
+    """Format an issue and its details as an output row"""
+    return [
+        timeframe,
+        repo,
+        issue_number,
+        issue_details["title"],
+        author,
+        "YES" if author in swedish_users else "NO",
+        issue_details["comment_count"],
+        "YES" if issue_details["commented_by_swedish"] else "NO",
+        issue_details["resolution_time"]
+    ]
+
+
+def save_table(df, output_file, failed_units=()):
+    """Write a PR/issue table through a temporary file. Rows of the (repository,
+    time frame) units whose crawl failed come from the existing table instead"""
+    failed_units = list(failed_units)
+    if failed_units:
+        def failed(table):
+            return pd.MultiIndex.from_arrays([table["Repository"], table["Time Frame"]]).isin(failed_units)
+
+        df = df[~failed(df)]
+        if os.path.exists(output_file):
+            previous = pd.read_csv(output_file)
+            df = pd.concat([df, previous[failed(previous)]], ignore_index=True)
+    tmp_file = f"{output_file}.tmp"
+    df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    print(f"✅ Saved {len(df)} rows to {output_file}")
@@ -0,0 +1,158 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cache_store import DB_FILE, connect
+from username_ids import MISSING_ID, UsernameIds, normalize_login
+
+# Who took part in which PR or issue, independent of any contributor cohort.
+#
+# The fetch scripts used to keep only "was one of the commenters Swedish?" in
+# their cached details, so a different cohort meant refetching. They now also
+# record the raw participants of every PR/issue (author, commenters,
+# reviewers) as integer user IDs from username_ids in the `participants`
+# table of the cache database. The table is indexed by user, which makes it an
+# inverted index: user -> PRs/issues by role.
+#
+# Involvement flags for any cohort (Sweden, UK, ...) are computed offline from
+# it in one vectorized pass, without new API calls:
+#
+#   python contributor_index.py pr swedish_contributor_prs.csv uk_users.csv --label UK
+#
+# PRs/issues whose details were cached before the index existed have no
+# participants until they are fetched again, their flags are left as they are.
+
+KINDS = {
+    "pr": "PR Number",
+    "issue": "Issue Number",
+}
+
+ROLES = {
+    "author": "Opened by",
+    "commenter": "Commented by",
+    "reviewer": "Reviewed by",
+}
+
+
+class ContributorIndex:
+    """Participants of PRs and issues by role, stored as user IDs and indexed by user"""
+
+    def __init__(self, path=DB_FILE, batch_size=100):
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS participants (
+                kind TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                PRIMARY KEY (kind, repo, number, role, user_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS participants_by_user ON participants (user_id, role);
+        """)
+        self.connection.commit()
+        self.username_ids = UsernameIds(path)
+        self.batch_size = batch_size
+        self.pending = {}
+
+    def record(self, kind, repo, number, author=None, commenters=(), reviewers=()):
+        """Store the participants of one PR/issue, replacing what was stored for it before"""
+        self.pending[(kind, repo, int(number))] = {
+            "author": [author] if author else [],
+            "commenter": list(commenters),
+            "reviewer": list(reviewers),
+        }
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Commit all buffered items in one transaction"""
+        if not self.pending:
+            return
+
+        # Every login of the batch gets its ID in one lookup
+        logins = {
+            login: normalize_login(login)
+            for roles in self.pending.values() for users in roles.values() for login in users
+        }
+        ids = self.username_ids.lookup(list(set(logins.values())))
+        rows = [
+            (kind, repo, number, role, ids[logins[login]])
+            for (kind, repo, number), roles in self.pending.items()
+            for role, users in roles.items()
+            for login in users
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM participants WHERE kind = ? AND repo = ? AND number = ?", list(self.pending)
+            )
+            self.connection.executemany("INSERT OR IGNORE INTO participants VALUES (?, ?, ?, ?, ?)", rows)
+        self.pending = {}
+
+    def items_of(self, login):
+        """(kind, repo, number, role) of every PR/issue a user took part in"""
+        self.flush()
+        user_id = self.username_ids.lookup([normalize_login(login)], assign=False).get(normalize_login(login))
+        if user_id is None:
+            return []
+        return self.connection.execute(
+            "SELECT kind, repo, number, role FROM participants WHERE user_id = ?", (user_id,)
+        ).fetchall()
+
+    def participants(self, kind):
+        """All participants of one kind of item as a (repo, number, role, user_id) frame"""
+        self.flush()
+        return pd.read_sql_query(
+            "SELECT repo, number, role, user_id FROM participants WHERE kind = ?", self.connection, params=(kind,)
+        )
+
+    def involvement(self, kind, cohort):
+        """Per (repo, number): whether a member of the cohort (a list of usernames)
+        is its author, one of its commenters or one of its reviewers"""
+        # Logins recorded in this session only get their IDs when the batch is flushed
+        self.flush()
+        cohort_ids = self.username_ids.encode(pd.Series(list(cohort), dtype="object"), assign=False)
+        cohort_ids = cohort_ids[cohort_ids != MISSING_ID].unique()
+
+        df = self.participants(kind)
+        df["member"] = np.isin(df["user_id"].to_numpy(), cohort_ids)
+        flags = df.groupby(["repo", "number", "role"])["member"].any().unstack(fill_value=False)
+        return flags.reindex(columns=list(ROLES), fill_value=False).astype(bool)
+
+
+def apply_cohort(table, index, kind, cohort, label):
+    """Copy of a PR/issue table with its "<role> by <label>" columns computed for the cohort.
+    Items that are not in the index keep the values they had, or get NaN for new columns"""
+    flags = index.involvement(kind, cohort)
+    keys = pd.MultiIndex.from_arrays([table["Repository"], table[KINDS[kind]].astype(int)])
+    found = keys.isin(flags.index)
+
+    table = table.copy()
+    for role, prefix in ROLES.items():
+        column = f"{prefix} {label}"
+        if kind == "issue" and role == "reviewer":
+            continue
+        values = pd.Series(np.where(flags[role].reindex(keys, fill_value=False), "YES", "NO"), index=table.index)
+        current = table[column] if column in table else pd.Series(np.nan, index=table.index, dtype="object")
+        table[column] = values.where(found, current)
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the involvement flags of a PR/issue table for a cohort")
+    parser.add_argument("kind", choices=list(KINDS))
+    parser.add_argument("table", help="CSV written by the PR or issue fetch script")
+    parser.add_argument("cohort", help="CSV with a Username column")
+    parser.add_argument("--label", default="Swedish", help='suffix of the flag columns, e.g. "Opened by <label>"')
+    parser.add_argument("--output", help="where to write the result (default: overwrite the table)")
+    args = parser.parse_args()
+
+    table = pd.read_csv(args.table)
+    cohort = pd.read_csv(args.cohort)["Username"].dropna().unique()
+    result = apply_cohort(table, ContributorIndex(), args.kind, cohort, args.label)
+
+    output_file = args.output or args.table
+    result.to_csv(output_file, index=False)
+    print(f"✅ Flagged {len(result)} rows for {len(cohort)} {args.label} contributors, saved to {output_file}")
@@ -0,0 +1,460 @@
+import asyncio
+import csv
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from commit_data import COMMIT_COLUMNS, commit_path, export_csv, pa, partition_path
+from contributions import (
+    ISSUE_COLUMNS, PR_COLUMNS, REPOSITORIES, TIME_FRAMES, issue_details, issue_row, pr_details, pr_row,
+    save_table
+)
+from contributor_index import ContributorIndex
+from github_client import GitHubClient, last_page
+from github_graphql import PAGE_SIZE
+from github_search import SEARCH_RESULT_CAP, split_window
+
+# One crawler for every kind of contribution.
+#
+# fetch.py, PRs_sweden/swedish_pull_request.py and issues_sweden/issues.py each
+# walk the same repositories and time frames on their own, and the issue crawl
+# pages through every PR a second time only to drop it. This crawler walks each
+# repository once over the whole span of the time frames:
+#
+# - one GraphQL search over closed issues *and* PRs, with the comment and
+#   review authors of each item in the same query
+# - one pass over the commit list
+#
+# and publishes a typed stream of events (commit, PR opened/merged, issue
+# opened/closed, comment, review) to whoever subscribed to the kinds they need.
+# The subscribers below rebuild the outputs of the three separate crawls, so
+# the PR and issue tables cost one search instead of two.
+#
+#   python event_crawler.py
+
+COMMIT = "commit"
+PR_OPENED = "pr_opened"
+PR_MERGED = "pr_merged"
+ISSUE_OPENED = "issue_opened"
+ISSUE_CLOSED = "issue_closed"
+COMMENT = "comment"
+REVIEW = "review"
+
+# `number` is the PR/issue number (None for commits), `data` holds the fields
+# specific to the kind, e.g. the title of an item or the SHA of a commit
+Event = namedtuple("Event", ["kind", "owner", "repo", "number", "actor", "at", "data"])
+
+# Sources to crawl, "items" (PRs, issues and their comments/reviews) and/or "commits"
+CRAWL_SOURCES = [source.strip() for source in os.getenv("CRAWL_SOURCES", "items,commits").split(",") if source.strip()]
+
+# Same repositories and time periods as the PR and issue crawls (the time
+# periods overlap, an event can belong to two of them)
+repositories = REPOSITORIES
+time_frames = TIME_FRAMES
+
+# Commit files use the lowercased repo name, except for these
+COMMIT_NAMES = {"youtube-dl": "youtube"}
+
+ITEM_SEARCH_QUERY = """
+query($q: String!, $first: Int!, $after: String) {
+  search(query: $q, type: ISSUE, first: $first, after: $after) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      __typename
+      ... on PullRequest {
+        number
+        title
+        createdAt
+        mergedAt
+        author { login }
+        comments(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { author { login } createdAt }
+        }
+        reviews(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { author { login } createdAt }
+        }
+      }
+      ... on Issue {
+        number
+        title
+        createdAt
+        closedAt
+        author { login }
+        comments(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { author { login } createdAt }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Filled in with the item field ("pullRequest" or "issue") and the connection name
+ITEM_CONNECTION_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    %s(number: $number) {
+      %s(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } createdAt }
+      }
+    }
+  }
+}
+"""
+
+PER_PAGE = 100
+
+
+def commit_name(repo):
+    """Directory name of a repository's commit files, as in commit_data.REPOS"""
+    return COMMIT_NAMES.get(repo, repo.lower())
+
+
+def time_frames_of(timestamp):
+    """Labels of every time frame an ISO timestamp falls into"""
+    return [label for since, until, label in time_frames if since <= timestamp <= until]
+
+
+def login_of(node):
+    return node["author"]["login"] if node.get("author") else None
+
+
+async def connection_nodes(client, owner, repo, node, connection_name):
+    """All nodes of an item's comments/reviews connection, following the cursor past the first page"""
+    connection = node[connection_name]
+    nodes = list(connection["nodes"])
+    page_info = connection["pageInfo"]
+    item_field = "pullRequest" if node["__typename"] == "PullRequest" else "issue"
+    query = ITEM_CONNECTION_QUERY % (item_field, connection_name)
+
+    while page_info["hasNextPage"]:
+        data = await client.graphql(query, {
+            "owner": owner,
+            "name": repo,
+            "number": node["number"],
+            "after": page_info["endCursor"],
+        })
+        if not data or not data["repository"] or not data["repository"][item_field]:
+            break
+
+        connection = data["repository"][item_field][connection_name]
+        nodes.extend(connection["nodes"])
+        page_info = connection["pageInfo"]
+
+    return [node for node in nodes if node]
+
+
+async def item_events(client, owner, repo, node):
+    """Events of one PullRequest/Issue node, the item itself first and then its comments and reviews"""
+    number = node["number"]
+    author = login_of(node)
+    data = {"title": node["title"], "created_at": node["createdAt"]}
+
+    if node["__typename"] == "PullRequest":
+        events = [Event(PR_OPENED, owner, repo, number, author, node["createdAt"], data)]
+        if node["mergedAt"]:
+            events.append(Event(PR_MERGED, owner, repo, number, author, node["mergedAt"], data))
+        connections = {COMMENT: "comments", REVIEW: "reviews"}
+    else:
+        events = [Event(ISSUE_OPENED, owner, repo, number, author, node["createdAt"], data)]
+        if node["closedAt"]:
+            events.append(Event(ISSUE_CLOSED, owner, repo, number, author, node["closedAt"], data))
+        connections = {COMMENT: "comments"}
+
+    for kind, connection_name in connections.items():
+        for child in await connection_nodes(client, owner, repo, node, connection_name):
+            events.append(Event(kind, owner, repo, number, login_of(child), child["createdAt"], data))
+
+    return events
+
+
+async def search_item_events(client, owner, repo, since, until):
+    """Yield pages of events for the closed issues and PRs created between since and until"""
+    # Oldest first, like the per-stage crawls
+    query = f"repo:{owner}/{repo} is:closed created:{since}..{until} sort:created-asc"
+    cursor = None
+
+    while True:
+        data = await client.graphql(ITEM_SEARCH_QUERY, {"q": query, "first": PAGE_SIZE, "after": cursor})
+        if not data:
+            raise RuntimeError(f"GraphQL search failed for '{query}'")
+        search = data["search"]
+
+        # Search is capped at 1000 results, split the window like github_search does
+        if cursor is None and search["issueCount"] > SEARCH_RESULT_CAP and since < until:
+            for sub_since, sub_until in split_window(since, until):
+                async for page in search_item_events(client, owner, repo, sub_since, sub_until):
+                    yield page
+            return
+
+        nodes = [node for node in search["nodes"] if node and "number" in node]
+        if nodes:
+            pages = await asyncio.gather(*(item_events(client, owner, repo, node) for node in nodes))
+            yield [event for events in pages for event in events]
+
+        if not search["pageInfo"]["hasNextPage"]:
+            return
+        cursor = search["pageInfo"]["endCursor"]
+
+
+def commit_event(owner, repo, commit):
+    author = commit["author"]["login"] if commit.get("author") else None
+    return Event(COMMIT, owner, repo, None, author, commit["commit"]["committer"]["date"], {
+        "sha": commit["sha"],
+        "message": commit["commit"]["message"],
+        "author_name": commit["commit"]["author"]["name"],
+        "authored_at": commit["commit"]["author"]["date"],
+    })
+
+
+async def commit_events(client, owner, repo, since, until):
+    """Yield pages of commit events between since and until, pages can arrive out of order"""
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    params = {"since": since, "until": until, "per_page": PER_PAGE}
+
+    async def fetch_page(page):
+        response = await client.get(url, params={**params, "page": page})
+        if response.status != 200:
+            raise RuntimeError(f"Failed to fetch commits of {owner}/{repo} page {page}: {response.status}")
+        return response
+
+    # The first page tells us (through the Link header) how many pages there are
+    response = await fetch_page(1)
+    if not response.data:
+        return
+    yield [commit_event(owner, repo, commit) for commit in response.data]
+
+    pages = last_page(response.headers) or 1
+    for next_page in asyncio.as_completed([fetch_page(page) for page in range(2, pages + 1)]):
+        response = await next_page
+        yield [commit_event(owner, repo, commit) for commit in response.data or []]
+
+
+class EventBus:
+    """Hands every published event to the subscribers of its kind"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback, kinds=None):
+        """Call callback(event) for every event of the given kinds (all kinds if None)"""
+        self.subscribers.append((set(kinds) if kinds else None, callback))
+
+    def publish(self, events):
+        for event in events:
+            for kinds, callback in self.subscribers:
+                if kinds is None or event.kind in kinds:
+                    callback(event)
+
+
+async def crawl_repository(client, bus, owner, repo, since, until, sources=CRAWL_SOURCES):
+    """Walk one repository once and publish its events page by page"""
+    streams = []
+    if "items" in sources:
+        streams.append(search_item_events(client, owner, repo, since, until))
+    if "commits" in sources:
+        streams.append(commit_events(client, owner, repo, since, until))
+
+    async def drain(stream):
+        count = 0
+        async for events in stream:
+            bus.publish(events)
+            count += len(events)
+        return count
+
+    # Items and commits are independent, walk both at the same time
+    counts = await asyncio.gather(*(drain(stream) for stream in streams))
+    print(f"✅ {owner}/{repo}: {sum(counts)} events")
+
+
+class ItemParticipants:
+    """Authors, commenters and reviewers of the PRs or issues seen on the stream"""
+
+    def __init__(self, opened_kind, done_kind):
+        self.opened_kind = opened_kind
+        self.done_kind = done_kind
+        self.kinds = {opened_kind, done_kind, COMMENT, REVIEW}
+        self.items = {}
+
+    def handle(self, event):
+        key = (event.owner, event.repo, event.number)
+        if event.kind == self.opened_kind:
+            self.items[key] = {
+                "title": event.data["title"], "author": event.actor, "created_at": event.at,
+                "done_at": None, "commenters": set(), "reviewers": set(),
+            }
+            return
+
+        # An item is published before its comments and reviews, so anything
+        # unknown here belongs to the other kind of item
+        item = self.items.get(key)
+        if item is None:
+            return
+        if event.kind == self.done_kind:
+            item["done_at"] = event.at
+        elif event.actor and event.kind == COMMENT:
+            item["commenters"].add(event.actor)
+        elif event.actor and event.kind == REVIEW:
+            item["reviewers"].add(event.actor)
+
+    def done_items(self):
+        """(owner, repo, number, item) of the items of our kind that were merged/closed"""
+        for (owner, repo, number), item in self.items.items():
+            if item["done_at"]:
+                yield owner, repo, number, item
+
+
+def pr_rows(participants, swedish_users):
+    """Rows of swedish_contributor_prs.csv"""
+    rows = []
+    for _, repo, number, pr in participants.done_items():
+        author = pr["author"] or "ghost"
+        details = pr_details(
+            pr["title"], pr["created_at"], pr["done_at"], pr["commenters"], pr["reviewers"], swedish_users
+        )
+        for timeframe in time_frames_of(pr["created_at"]):
+            rows.append(pr_row(timeframe, repo, number, author, details, swedish_users))
+    return pd.DataFrame(rows, columns=PR_COLUMNS)
+
+
+def issue_rows(participants, swedish_users):
+    """Rows of swedish_contributor_issues.csv"""
+    rows = []
+    for _, repo, number, issue in participants.done_items():
+        author = issue["author"] or "ghost"
+        details = issue_details(issue["title"], issue["created_at"], issue["done_at"], issue["commenters"], swedish_users)
+        for timeframe in time_frames_of(issue["created_at"]):
+            rows.append(issue_row(timeframe, repo, number, author, details, swedish_users))
+    return pd.DataFrame(rows, columns=ISSUE_COLUMNS)
+
+
+class CommitFiles:
+    """Streams commit events into the per-repo/timeframe commit CSVs that fetch.py writes.
+
+    Rows go to temporary files next to the real ones, which only replace them
+    once the crawl of that repository has finished, so a failed crawl never
+    truncates a complete file."""
+
+    kinds = {COMMIT}
+
+    def __init__(self):
+        self.files = {}
+
+    def _writer(self, repo, timeframe):
+        key = (repo, timeframe)
+        if key not in self.files:
+            filename = commit_path(repo, timeframe)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            file = open(f"{filename}.tmp", "w", newline="", encoding="utf-8")
+            writer = csv.writer(file)
+            writer.writerow(COMMIT_COLUMNS)
+            self.files[key] = (file, writer)
+        return self.files[key][1]
+
+    def handle(self, event):
+        row = [
+            event.data["sha"],
+            event.data["message"],
+            event.data["author_name"],
+            event.actor or "Unknown",
+            event.data["authored_at"],
+        ]
+        for timeframe in time_frames_of(event.at):
+            self._writer(commit_name(event.repo), timeframe).writerow(row)
+
+    def commit(self, repo):
+        """Move a finished repository's files into place and refresh its Parquet partitions"""
+        name = commit_name(repo)
+        for _, _, timeframe in time_frames:
+            # Time frames without commits still get a file with just the header
+            self._writer(name, timeframe)
+            file, _ = self.files.pop((name, timeframe))
+            file.close()
+
+            filename = commit_path(name, timeframe)
+            os.replace(f"{filename}.tmp", filename)
+            if pa is not None:
+                export_csv(filename, name, timeframe)
+            elif os.path.exists(partition_path(name, timeframe)):
+                # Without pyarrow the partition cannot be refreshed, drop it so readers use the CSV
+                os.remove(partition_path(name, timeframe))
+        print(f"✅ Wrote the commit files of {repo}")
+
+    def discard(self, repo):
+        """Drop the temporary files of a repository whose crawl failed"""
+        name = commit_name(repo)
+        for _, _, timeframe in time_frames:
+            entry = self.files.pop((name, timeframe), None)
+            if entry:
+                entry[0].close()
+                os.remove(f"{commit_path(name, timeframe)}.tmp")
+
+
+async def main():
+    swedish_users = set()
+    if os.path.exists("repos_sweden_users.csv"):
+        swedish_users.update(pd.read_csv("repos_sweden_users.csv")["Username"].dropna().unique())
+    print(f"✅ Loaded {len(swedish_users)} unique Swedish contributors.")
+
+    bus = EventBus()
+    prs = ItemParticipants(PR_OPENED, PR_MERGED)
+    issues = ItemParticipants(ISSUE_OPENED, ISSUE_CLOSED)
+    commits = CommitFiles()
+    bus.subscribe(prs.handle, prs.kinds)
+    bus.subscribe(issues.handle, issues.kinds)
+    bus.subscribe(commits.handle, commits.kinds)
+
+    # One walk per repository over the whole span of the time frames
+    since = min(frame[0] for frame in time_frames)
+    until = max(frame[1] for frame in time_frames)
+    async with GitHubClient() as client:
+        # A failing repository must not abort the others
+        results = await asyncio.gather(*(
+            crawl_repository(client, bus, owner, repo, since, until)
+            for owner, repo in repositories
+        ), return_exceptions=True)
+
+    failed_repos = set()
+    for (owner, repo), result in zip(repositories, results):
+        if isinstance(result, BaseException):
+            print(f"❌ Crawl of {owner}/{repo} failed, keeping its previous data: {result}")
+            failed_repos.add(repo)
+            commits.discard(repo)
+        elif "commits" in CRAWL_SOURCES:
+            commits.commit(repo)
+
+    if "items" in CRAWL_SOURCES:
+        # Keep the raw participants so other cohorts can be flagged offline. Items
+        # are published complete, so those of failed repositories are kept too
+        index = ContributorIndex()
+        for kind, participants in (("pr", prs), ("issue", issues)):
+            for _, repo, number, item in participants.done_items():
+                index.record(kind, repo, number, item["author"], item["commenters"], item["reviewers"])
+        index.flush()
+
+        # Rows of failed repositories come from the existing tables instead
+        failed_units = [(repo, timeframe) for repo in failed_repos for _, _, timeframe in time_frames]
+        for df, output_file in (
+            (pr_rows(prs, swedish_users), "swedish_contributor_prs.csv"),
+            (issue_rows(issues, swedish_users), "swedish_contributor_issues.csv"),
+        ):
+            save_table(df, output_file, failed_units)
+
+    if failed_repos:
+        raise SystemExit(f"❌ {len(failed_repos)} repositories failed, rerun to retry them")
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    print(f"🚀 Script started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    asyncio.run(main())
+    duration = time.time() - start_time
+    print(f"✨ Script completed in {duration:.2f} seconds ({duration/60:.2f} minutes)")
@@ -1,18 +1,16 @@
-import requests
+import asyncio
 import csv
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-TOKEN = os.getenv("GITHUB_TOKEN")
+from checkpoint import Checkpoint
+from commit_data import commit_path, export_csv, partition_path, pa
+from github_client import GitHubClient, last_page
+from incremental import INCREMENTAL, Watermarks
 
 repositories = [
     ("kubernetes", "kubernetes"),
     ("tensorflow","tensorflow"),
 ]
 
-HEADERS = {"Authorization": f"token {TOKEN}"} if TOKEN else {}
-
 # Timeline
 time_frames = [
     ("2018-01-01T00:00:00Z", "2019-12-31T23:59:59Z"),
@@ -20,55 +18,153 @@ time_frames = [
     ("2022-06-01T00:00:00Z", "2024-06-30T23:59:59Z"),
 ]
 
+# High-water marks (latest commit date/SHA) for incremental refreshes
+watermarks = Watermarks()
+
+def read_existing_shas(filename):
+    """SHAs already saved in a commits CSV"""
+    with open(filename, "r", newline="", encoding="utf-8") as file:
+        return {row["SHA"] for row in csv.DictReader(file)}
+
+def commit_row(commit):
+    author_name = commit["commit"]["author"]["name"]
+    author_username = commit["author"]["login"] if commit.get("author") else "Unknown"  # Extract GitHub username
+
+    return [
+        commit["sha"],
+        commit["commit"]["message"],
+        author_name,
+        author_username,  # Add username
+        commit["commit"]["author"]["date"]
+    ]
+
 # fetch timeline
-def fetch_commits(owner, repo, since, until):
+async def fetch_commits(client, owner, repo, since, until):
     BASE_URL = f"https://api.github.com/repos/{owner}/{repo}/commits"
-    per_page = 100  
-    page = 1
-    all_commits = []
+    per_page = 100
     repo_shortname = repo.lower()
-    filename = f"commits_{since[:4]}_{until[:4]}_{repo_shortname}.csv"
-
-    while True:
-        # Fetch commits on current page
-        URL = f"{BASE_URL}?since={since}&until={until}&per_page={per_page}&page={page}"
-        response = requests.get(URL, headers=HEADERS)
-
-        if response.status_code != 200:
-            print(f"Failed to fetch commits ({filename}): {response.status_code} - {response.text}")
-            break
-
-        commits = response.json()
-        
-        if not commits:
-            break  
-
-        for commit in commits:
-            author_name = commit["commit"]["author"]["name"]
-            author_username = commit["author"]["login"] if commit.get("author") else "Unknown"  # Extract GitHub username
-
-            all_commits.append([
-                commit["sha"],
-                commit["commit"]["message"],
-                author_name,
-                author_username,  # Add username
-                commit["commit"]["author"]["date"]
-            ])
-
-        print(f"✅ Fetched {len(commits)} commits from page {page} for {owner}/{repo}")
-        page += 1  # go to next page
-
-    # Save 
-    with open(filename, "w", newline="", encoding="utf-8") as file:
+    label = f"{since[:4]}_{until[:4]}"
+    # <repo>/<repo>_results/commits_<label>_<repo>.csv, where the analysis scripts read it
+    filename = commit_path(repo_shortname, label)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    # Resume an interrupted crawl with the same parameters it was started with
+    checkpoint = Checkpoint(f"commits:{owner}/{repo}:{label}")
+    meta = checkpoint.meta()
+    resuming = meta is not None and os.path.exists(filename)
+    done_pages = dict(checkpoint.pages()) if resuming else {}
+
+    # Incremental refresh: only ask for commits newer than the last one we saved
+    mark = watermarks.get("commits", owner, repo, label)
+    if resuming:
+        incremental = True
+        fetch_since = meta["since"]
+        print(f"⏯️ Resuming {owner}/{repo} ({label}), {len(done_pages)} pages already saved")
+    else:
+        incremental = INCREMENTAL and mark and mark.get("date") and os.path.exists(filename)
+        fetch_since = max(since, mark["date"]) if incremental else since
+        checkpoint.clear()
+        checkpoint.start(since=fetch_since)
+    # Rows already in the file are skipped (also covers a page written just before a crash)
+    existing_shas = read_existing_shas(filename) if incremental else set()
+
+    params = {"since": fetch_since, "until": until, "per_page": per_page}
+    state = {"saved": 0, "latest_date": None, "latest_sha": None, "completed": True}
+
+    def track_latest(date, sha):
+        if date and (state["latest_date"] is None or date > state["latest_date"]):
+            state["latest_date"], state["latest_sha"] = date, sha
+
+    for entry in done_pages.values():
+        track_latest(entry.get("latest_date"), entry.get("latest_sha"))
+
+    # Rows are streamed to the file as each page arrives, so memory stays flat and
+    # a crash keeps every page written so far. Pages can finish out of order.
+    with open(filename, "a" if incremental else "w", newline="", encoding="utf-8") as file:
         writer = csv.writer(file)
-        writer.writerow(["SHA", "Message", "Author", "Username", "Date"])
+        if not incremental:
+            writer.writerow(["SHA", "Message", "Author", "Username", "Date"])
+
+        def write_page(page, commits):
+            rows = []
+            page_latest = (None, None)
+            for commit in commits:
+                # Newest commit seen so far becomes the next high-water mark
+                committed_at = commit["commit"]["committer"]["date"]
+                if page_latest[0] is None or committed_at > page_latest[0]:
+                    page_latest = (committed_at, commit["sha"])
+
+                if commit["sha"] not in existing_shas:
+                    rows.append(commit_row(commit))
+
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+            # The rows are on disk, now mark the page as done
+            checkpoint.commit_page(page, latest_date=page_latest[0], latest_sha=page_latest[1])
+            track_latest(*page_latest)
+            state["saved"] += len(rows)
+            print(f"✅ Fetched {len(commits)} commits from page {page} for {owner}/{repo} ({label})")
+
+        async def fetch_page(page):
+            response = await client.get(BASE_URL, params={**params, "page": page})
+            if response.status != 200:
+                print(f"Failed to fetch commits ({filename}) page {page}: {response.status} - {response.data}")
+                state["completed"] = False
+                return page, [], response
+            return page, response.data or [], response
+
+        if resuming and meta.get("pages") is not None:
+            pages = meta["pages"]
+        else:
+            # The first page tells us (through the Link header) how many pages there are
+            _, commits, response = await fetch_page(1)
+            if commits:
+                write_page(1, commits)
+            pages = (last_page(response.headers) or 1) if commits else 0
+            if state["completed"]:
+                checkpoint.update(pages=pages)
+
+        # Fan out over the remaining pages, the client's in-flight limit bounds concurrency
+        todo = [page for page in range(2, pages + 1) if page not in done_pages]
+        for next_page in asyncio.as_completed([fetch_page(page) for page in todo]):
+            page, commits, _ = await next_page
+            if commits:
+                write_page(page, commits)
+
+    if not state["completed"]:
+        # Keep the checkpoint, the next run only fetches the pages that are missing
+        raise RuntimeError("some pages could not be fetched")
+
+    # Only move the mark after a complete pass, otherwise missing pages would be skipped next time
+    latest_date = state["latest_date"]
+    if latest_date and (not mark or not mark.get("date") or latest_date > mark["date"]):
+        watermarks.set("commits", owner, repo, label, date=latest_date, sha=state["latest_sha"])
+    checkpoint.clear()
+    print(f"✅ Saved {state['saved']} {'new ' if incremental else ''}commits to {filename}")
+
+    if pa is not None:
+        # Typed, column-pruned copy for the analysis scripts
+        export_csv(filename, repo_shortname, label)
+        print(f"📦 Exported {filename} to {partition_path(repo_shortname, label)}")
 
-        for commit in all_commits:
-            writer.writerow(commit)
+async def main():
+    units = [(owner, repo, since, until) for owner, repo in repositories for since, until in time_frames]
+    async with GitHubClient() as client:
+        # Fetch commits for every repository and timeline at the same time,
+        # a unit that fails does not stop the others
+        results = await asyncio.gather(*(
+            fetch_commits(client, owner, repo, since, until)
+            for owner, repo, since, until in units
+        ), return_exceptions=True)
 
-    print(f"✅ Saved {len(all_commits)} commits to {filename}")
+    failed = 0
+    for (owner, repo, since, until), result in zip(units, results):
+        if isinstance(result, BaseException):
+            # Its checkpoint stays in place, the next run resumes it
+            print(f"❌ {owner}/{repo} ({since[:4]}_{until[:4]}) failed, rerun to resume: {result}")
+            failed += 1
+    if failed:
+        raise SystemExit(f"❌ {failed} of {len(units)} units failed")
 
-# Fetch commits for each timeline
-for owner, repo in repositories:
-    for since, until in time_frames:
-        fetch_commits(owner, repo, since, until)
\ No newline at end of file
+asyncio.run(main())
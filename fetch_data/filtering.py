@@ -1,64 +1,77 @@
 import numpy as np
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from commit_data import REPOS, COUNT_COLUMNS, combine_commits, commit_counts, load_repo_commits, normalize_usernames
+from username_ids import UsernameIds
 
-repo_list = ['electron','freecodecamp','kubernetes', 'n8n', 'pytorch', 'react', 'superset', 'tensorflow', 'vscode', 'vue', 'youtube']
+repo_list = REPOS
 
-authors = []
+# Worker processes that read and count repositories in parallel (1 runs them in this process)
+WORKERS = int(os.getenv("FILTERING_WORKERS", str(os.cpu_count() or 1)))
 
-if __name__ == '__main__':
-    i = 0
-    while i < len(repo_list):
-        name = repo_list[i]
-        try:
-            # Load commit data for different time periods
-            pre_pandemic = pd.read_csv(f'{name}/{name}_results/commits_2018_2019_{name}.csv')
-            pandemic = pd.read_csv(f'{name}/{name}_results/commits_2020_2022_{name}.csv')
-            post_pandemic = pd.read_csv(f'{name}/{name}_results/commits_2022_2024_{name}.csv')
+def process_repo(name):
+    """Read one repository's commits and authors, return its commit counts and author list"""
+    # Load commit data for all time periods (only the Username column is needed)
+    commits = combine_commits([load_repo_commits(name)], [name])
 
-            # Load author data
-            curr_authors = pd.read_csv(f'{name}/{name}_authors/{name}_authors_uk.csv')
+    # Count commits per author and period in one pass, only the counts go back to the parent
+    counts = commit_counts(commits)
 
-            # Add repository information to the authors dataframe
-            curr_authors['repository'] = name
-            
-                    
-            # Then normalize the author names
-            pre_pandemic['Username'] = pre_pandemic['Username'].str.lower().str.strip() 
-            pandemic['Username'] = pandemic['Username'].str.lower().str.strip()
-            post_pandemic['Username'] = post_pandemic['Username'].str.lower().str.strip()
-            curr_authors['Username'] = curr_authors['Username'].str.lower().str.strip()
-            
-            # Count pre-pandemic commits
-            pre_commit_counts = pre_pandemic['Username'].value_counts().reset_index()
-            pre_commit_counts.columns = ['Username', 'pre_pandemic_commits']
-            
-            # Count pandemic commits
-            pandemic_commit_counts = pandemic['Username'].value_counts().reset_index()
-            pandemic_commit_counts.columns = ['Username', 'pandemic_commits']
-            
-            # Count post-pandemic commits
-            post_commit_counts = post_pandemic['Username'].value_counts().reset_index()
-            post_commit_counts.columns = ['Username', 'post_pandemic_commits']
-            
-            # Merge commit counts with author data
-            merged_authors = curr_authors.copy()
-            merged_authors = merged_authors.merge(pre_commit_counts, on='Username', how='left')
-            merged_authors = merged_authors.merge(pandemic_commit_counts, on='Username', how='left')
-            merged_authors = merged_authors.merge(post_commit_counts, on='Username', how='left')
-            
-            # Fill NaN values with 0 (authors with no commits in a period)
-            merged_authors['pre_pandemic_commits'] = merged_authors['pre_pandemic_commits'].fillna(0).astype(int)
-            merged_authors['pandemic_commits'] = merged_authors['pandemic_commits'].fillna(0).astype(int)
-            merged_authors['post_pandemic_commits'] = merged_authors['post_pandemic_commits'].fillna(0).astype(int)
-            
-            # Calculate total commits
-            merged_authors['total_commits'] = (
-                merged_authors['pre_pandemic_commits'] + 
-                merged_authors['pandemic_commits'] + 
-                merged_authors['post_pandemic_commits']
-            )
-            
+    # Load author data
+    curr_authors = pd.read_csv(f'{name}/{name}_authors/{name}_authors_uk.csv')
+
+    # Add repository information to the authors dataframe
+    curr_authors['repository'] = name
+    curr_authors['Username'] = normalize_usernames(curr_authors['Username'])
+
+    return counts, curr_authors
+
+def process_repos(names, workers=WORKERS):
+    """Run process_repo for every repository, errors are reported per repository"""
+    results = {}
+    if workers > 1 and len(names) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(names))) as executor:
+            futures = {executor.submit(process_repo, name): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error processing repository {name}: {str(e)}")
+    else:
+        for name in names:
+            try:
+                results[name] = process_repo(name)
+            except Exception as e:
+                print(f"Error processing repository {name}: {str(e)}")
+
+    # Keep the order of the repository list
+    return [results[name] for name in names if name in results]
+
+if __name__ == '__main__':
+    results = process_repos(repo_list)
+    count_frames = [counts for counts, _ in results]
+    authors = [curr_authors for _, curr_authors in results]
+    
+    if authors:
+        all_authors = pd.concat(authors, ignore_index=True)
+        
+        # Join the commit counts of all repositories once, on integer user IDs
+        counts = pd.concat(count_frames, ignore_index=True).rename(columns={'repo': 'repository'})
+        username_ids = UsernameIds()
+        counts['user_id'] = username_ids.encode(counts.pop('Username'))
+        all_authors['user_id'] = username_ids.encode(all_authors['Username'])
+        all_authors = all_authors.merge(counts, on=['repository', 'user_id'], how='left').drop(columns='user_id')
+        
+        # Fill NaN values with 0 (authors with no commits in a period)
+        count_columns = list(COUNT_COLUMNS.values())
+        all_authors[count_columns] = all_authors[count_columns].fillna(0).astype(int)
+        
+        # Calculate total commits
+        all_authors['total_commits'] = all_authors[count_columns].sum(axis=1)
+        
+        for name, merged_authors in all_authors.groupby('repository', sort=False):
             # Debug information
             zero_commit_authors = merged_authors[merged_authors['total_commits'] == 0]
             if len(zero_commit_authors) > 0:
@@ -66,26 +79,14 @@ if __name__ == '__main__':
                 print(f"  Found {len(zero_commit_authors)} authors with zero commits in our time periods")
                 print("  This might indicate authors who committed outside our studied time periods")
                 print("  or name formatting inconsistencies between commits and author lists")
-                print("  Sample of zero-commit authors:", zero_commit_authors['Author'].iloc[:5].tolist())
-            
-            # Include all authors regardless of commit count
-            authors.append(merged_authors)
+                print("  Sample of zero-commit authors:", zero_commit_authors['Username'].iloc[:5].tolist())
             
             # Print repository summary
             print(f"\nRepository: {name}")
             print(f"  Total authors: {len(merged_authors)}")
             print(f"  Authors with commits in our time periods: {len(merged_authors[merged_authors['total_commits'] > 0])}")
             print(f"  Total commits: {merged_authors['total_commits'].sum()}")
-            
-            i += 1
-            
-        except Exception as e:
-            print(f"Error processing repository {name}: {str(e)}")
-            i += 1
-    
-    # Combine all authors into a single dataframe
-    if authors:
-        all_authors = pd.concat(authors, ignore_index=True)
+        
         print("\n=== SUMMARY ===")
         print(f"Total authors across all repositories: {len(all_authors)}")
         print(f"Authors with commits in our time periods: {len(all_authors[all_authors['total_commits'] > 0])}")
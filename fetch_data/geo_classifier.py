@@ -0,0 +1,117 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Country classifier for free-text GitHub profile locations.
+#
+# The keyword lists of every country (country_keywords.json, or the file in
+# GEO_KEYWORDS_FILE) are compiled into one regex with a named group per country
+# and word boundaries around each keyword, so "UK" no longer matches inside
+# "Ukraine" or "Lukas". Keywords are matched case-insensitively, except all-caps
+# abbreviations like "UK" which have to match exactly. A country can list
+# keyword_suffixes that may follow a keyword, e.g. "shire" so "Aberdeen" also
+# matches "Aberdeenshire" and "Oxford" "Oxfordshire". Results are memoized per
+# distinct location, and classify_frame() only runs the regex once per distinct
+# value of a column.
+
+KEYWORDS_FILE = os.getenv(
+    "GEO_KEYWORDS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "country_keywords.json")
+)
+
+MISSING = {"", "Unknown", "User Not Found", "Error"}
+
+
+def keyword_pattern(keywords):
+    """Alternation of keywords, longest first, all-caps ones case-sensitive"""
+    keywords = sorted(set(keywords), key=len, reverse=True)
+    exact = [re.escape(keyword) for keyword in keywords if keyword.isupper()]
+    folded = [re.escape(keyword) for keyword in keywords if not keyword.isupper()]
+    parts = []
+    if folded:
+        parts.append(f"(?i:{'|'.join(folded)})")
+    parts.extend(exact)
+    return "|".join(parts)
+
+
+def suffix_pattern(spec):
+    """Optional case-insensitive suffix group for a country's keyword_suffixes"""
+    suffixes = spec.get("keyword_suffixes", [])
+    if not suffixes:
+        return ""
+    return f"(?i:{'|'.join(re.escape(suffix) for suffix in suffixes)})?"
+
+
+class GeoClassifier:
+    """Map locations (and optionally emails) to the set of countries they mention"""
+
+    def __init__(self, countries):
+        self.countries = list(countries)
+        groups = [
+            f"(?P<{self._group(country)}>(?:{keyword_pattern(spec['keywords'])}){suffix_pattern(spec)})"
+            for country, spec in countries.items()
+        ]
+        self.regex = re.compile(rf"(?<!\w)(?:{'|'.join(groups)})(?!\w)")
+        self.email_suffixes = {
+            country: tuple(suffix.lower() for suffix in spec.get("email_suffixes", []))
+            for country, spec in countries.items()
+        }
+        self.match_location = lru_cache(maxsize=None)(self._match_location)
+
+    @classmethod
+    def from_file(cls, path=KEYWORDS_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _group(country):
+        # Group names have to be identifiers
+        return re.sub(r"\W", "_", country)
+
+    def _match_location(self, location):
+        names = {self._group(country): country for country in self.countries}
+        return frozenset(names[match.lastgroup] for match in self.regex.finditer(location))
+
+    def match_email(self, email):
+        email = email.lower()
+        return frozenset(
+            country for country, suffixes in self.email_suffixes.items()
+            if suffixes and email.endswith(suffixes)
+        )
+
+    def classify(self, location, email=None):
+        """Countries a single location/email points to"""
+        countries = frozenset()
+        if isinstance(location, str) and location not in MISSING:
+            countries |= self.match_location(location)
+        if isinstance(email, str) and email not in MISSING:
+            countries |= self.match_email(email)
+        return countries
+
+    def classify_frame(self, df, location_column="Location", email_column=None):
+        """One boolean column per country for every row of df"""
+        result = pd.DataFrame(index=df.index)
+        matches = {country: np.zeros(len(df), dtype=bool) for country in self.countries}
+
+        columns = [(location_column, self.match_location)]
+        if email_column:
+            columns.append((email_column, self.match_email))
+
+        for column, match in columns:
+            # Classify each distinct value once, then broadcast back to the rows
+            codes, uniques = pd.factorize(df[column])
+            found = [
+                match(value) if isinstance(value, str) and value not in MISSING else frozenset()
+                for value in uniques
+            ]
+            for country in self.countries:
+                # The extra False at the end is what missing values (code -1) pick up
+                hits = np.array([country in countries for countries in found] + [False], dtype=bool)
+                matches[country] |= hits[codes]
+
+        for country in self.countries:
+            result[country] = matches[country]
+        return result
@@ -0,0 +1,292 @@
+import asyncio
+import os
+import re
+import time
+from collections import namedtuple
+
+import aiohttp
+from dotenv import load_dotenv
+from multidict import CIMultiDict
+
+from http_cache import ResponseCache
+
+# Shared async GitHub API client used by the fetch scripts.
+#
+# Rate limits are tracked from the X-RateLimit-* headers that GitHub sends back
+# on every normal response, so we never spend requests on /rate_limit. Each
+# rate-limit resource (core, search, graphql) gets its own local token bucket
+# and we only sleep when that bucket is actually empty.
+#
+# Several tokens can be pooled (GITHUB_TOKENS=tok1,tok2,...). Every token has its
+# own buckets, each request goes to the token with the most headroom left and
+# the client only sleeps once every token in the pool is exhausted.
+
+load_dotenv()
+TOKEN = os.getenv("GITHUB_TOKEN")
+TOKENS = [token.strip() for token in os.getenv("GITHUB_TOKENS", "").split(",") if token.strip()] or [TOKEN]
+
+API_URL = "https://api.github.com"
+GRAPHQL_URL = f"{API_URL}/graphql"
+
+# Upper bound on requests in flight at once across everything sharing a client
+MAX_IN_FLIGHT = int(os.getenv("GITHUB_MAX_IN_FLIGHT", "20"))
+
+# Revalidate GET responses with ETags instead of refetching them (set to 0 to disable)
+USE_HTTP_CACHE = os.getenv("HTTP_CACHE", "1") != "0"
+
+# Seconds to back off on a secondary rate limit without Retry-After, grows with each retry
+SECONDARY_LIMIT_WAIT = 60
+
+# Default bucket sizes until the first response tells us the real numbers
+DEFAULT_LIMITS = {
+    "core": 5000,
+    "search": 30,
+    "graphql": 5000,
+}
+
+GitHubResponse = namedtuple("GitHubResponse", ["status", "data", "headers"])
+
+
+def resource_for_url(url):
+    """Guess which rate-limit resource a request will be charged to"""
+    if "/search/" in url:
+        return "search"
+    if url.rstrip("/").endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+def is_rate_limited(response):
+    """Whether a 403/429 is a rate limit (always for 429) rather than missing permissions"""
+    if response.status == 429:
+        return True
+    message = response.data.get("message", "") if isinstance(response.data, dict) else ""
+    # Older secondary-limit responses talk about abuse detection instead
+    return "rate limit" in message.lower() or "abuse" in message.lower()
+
+
+def last_page(headers):
+    """Number of the last page from a Link header, or None if there is only one page"""
+    match = re.search(r'[?&]page=(\d+)[^>]*>; rel="last"', headers.get("Link", ""))
+    return int(match.group(1)) if match else None
+
+
+def next_link(headers):
+    """URL of the next page from a Link header, or None on the last page"""
+    match = re.search(r'<([^>]+)>; rel="next"', headers.get("Link", ""))
+    return match.group(1) if match else None
+
+
+class RateLimiter:
+    """Local token bucket per rate-limit resource, synced from response headers"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def _bucket(self, resource):
+        if resource not in self.buckets:
+            limit = DEFAULT_LIMITS.get(resource, DEFAULT_LIMITS["core"])
+            self.buckets[resource] = {"limit": limit, "remaining": limit, "reset": None}
+        return self.buckets[resource]
+
+    def remaining(self, resource="core"):
+        """Tokens left in a bucket, refilling it first if its window has rolled over"""
+        bucket = self._bucket(resource)
+        if bucket["reset"] is not None and bucket["reset"] <= time.time():
+            bucket["remaining"] = bucket["limit"]
+            bucket["reset"] = None
+        return bucket["remaining"]
+
+    def try_acquire(self, resource="core"):
+        """Take one token from the bucket if it is not empty"""
+        if self.remaining(resource) > 0:
+            self._bucket(resource)["remaining"] -= 1
+            return True
+        return False
+
+    def wait_time(self, resource="core"):
+        """Seconds until an empty bucket is full again"""
+        reset = self._bucket(resource)["reset"]
+        # Empty but no reset time known yet, wait for a response to sync us
+        return 1 if reset is None else max(reset - time.time() + 1, 1)
+
+    async def acquire(self, resource="core"):
+        """Take one token from the bucket, sleeping only if it is empty"""
+        while not self.try_acquire(resource):
+            await asyncio.sleep(self.wait_time(resource))
+
+    def update(self, headers):
+        """Sync the bucket with the X-RateLimit-* headers of a response"""
+        if "X-RateLimit-Remaining" not in headers:
+            return
+
+        resource = headers.get("X-RateLimit-Resource", "core")
+        bucket = self._bucket(resource)
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = int(headers.get("X-RateLimit-Reset", 0))
+        bucket["limit"] = int(headers.get("X-RateLimit-Limit", bucket["limit"]))
+
+        if bucket["reset"] is None or reset > bucket["reset"]:
+            # First response of a new window
+            bucket["remaining"] = remaining
+            bucket["reset"] = reset
+        else:
+            # Responses can arrive out of order, so never give tokens back
+            bucket["remaining"] = min(bucket["remaining"], remaining)
+
+
+class TokenPool:
+    """Tokens with one rate limiter each, handing out the one with the most headroom"""
+
+    def __init__(self, tokens):
+        self.tokens = list(tokens) or [None]
+        self.limiters = [RateLimiter() for _ in self.tokens]
+
+    async def acquire(self, resource="core"):
+        """Take one request from the token with the most headroom and return its index,
+        sleeping only when every token is exhausted"""
+        while True:
+            index = max(range(len(self.tokens)), key=lambda i: self.limiters[i].remaining(resource))
+            if self.limiters[index].try_acquire(resource):
+                return index
+
+            sleep_time = min(limiter.wait_time(resource) for limiter in self.limiters)
+            if sleep_time > 1:
+                print(f"🚨 {resource} rate limit reached on all {len(self.tokens)} tokens! Sleeping for {sleep_time:.1f} seconds")
+            await asyncio.sleep(sleep_time)
+
+    def auth_header(self, index):
+        token = self.tokens[index]
+        return {"Authorization": f"token {token}"} if token else {}
+
+    def update(self, index, headers):
+        self.limiters[index].update(headers)
+
+
+class GitHubClient:
+    """Async GitHub client sharing one session and one token pool"""
+
+    def __init__(self, tokens=None, max_in_flight=MAX_IN_FLIGHT, max_retries=5, use_cache=USE_HTTP_CACHE):
+        self.max_retries = max_retries
+        self.pool = TokenPool(TOKENS if tokens is None else tokens)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.cache = ResponseCache() if use_cache else None
+        self.session = None
+
+    async def __aenter__(self):
+        # Authorization is set per request, depending on which token is picked
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        self.session = aiohttp.ClientSession(
+            headers=headers, timeout=aiohttp.ClientTimeout(total=60)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def request(self, method, url, params=None, json_body=None):
+        """Send a request, retrying on rate limits and network errors"""
+        if not url.startswith("http"):
+            url = f"{API_URL}{url}"
+        resource = resource_for_url(url)
+
+        # Only GETs can be revalidated
+        cached = self.cache.get(url, params) if self.cache and method == "GET" else None
+        headers = ResponseCache.validator_headers(cached) if cached else None
+
+        for attempt in range(self.max_retries):
+            token_index = await self.pool.acquire(resource)
+
+            try:
+                async with self.in_flight:
+                    response = await self._send(method, url, params, json_body, headers, token_index)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️ Request error for {url}: {e}")
+                await asyncio.sleep(5 * (attempt + 1))
+                continue
+
+            if response.status >= 500:
+                # Gateway errors and timeouts on GitHub's side, back off like a network error
+                print(f"⚠️ Server error {response.status} for {url}")
+                await asyncio.sleep(5 * (attempt + 1))
+                continue
+
+            if response.status in (403, 429):
+                if "Retry-After" in response.headers:
+                    # Secondary rate limit, sleep outside the in-flight slot
+                    retry_after = int(response.headers["Retry-After"])
+                    print(f"🚨 Secondary rate limit! Waiting for {retry_after} seconds...")
+                    await asyncio.sleep(retry_after)
+                    continue
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    # This token is empty now, acquire() moves on to another one or sleeps
+                    continue
+                if is_rate_limited(response):
+                    # Secondary rate limit without Retry-After, GitHub asks for at least a minute
+                    wait = SECONDARY_LIMIT_WAIT * (attempt + 1)
+                    print(f"🚨 Secondary rate limit! Waiting for {wait} seconds...")
+                    await asyncio.sleep(wait)
+                    continue
+
+            if response.status == 304 and cached:
+                # Not modified, serve the stored body (and Link header if GitHub left it out)
+                headers = CIMultiDict(response.headers)
+                if cached.get("link") and "Link" not in headers:
+                    headers["Link"] = cached["link"]
+                return GitHubResponse(200, cached["data"], headers)
+
+            if response.status == 200 and self.cache and method == "GET":
+                self.cache.put(url, params, response.headers, response.data)
+
+            return response
+
+        raise RuntimeError(f"Giving up on {url} after {self.max_retries} attempts")
+
+    async def _send(self, method, url, params, json_body, headers=None, token_index=0):
+        headers = {**(headers or {}), **self.pool.auth_header(token_index)}
+        async with self.session.request(method, url, params=params, json=json_body, headers=headers) as response:
+            self.pool.update(token_index, response.headers)
+            data = None
+            if response.status not in (204, 304):
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    # Not JSON, e.g. the HTML page of a 502
+                    pass
+            return GitHubResponse(response.status, data, response.headers)
+
+    async def get(self, url, params=None):
+        return await self.request("GET", url, params=params)
+
+    async def get_all(self, url, params=None):
+        """GET every page of a list endpoint (following Link: rel="next") and return all items.
+        Raises RuntimeError if a page cannot be fetched, so a partial list is never returned"""
+        items = []
+        # The next link already carries the query string
+        params = {"per_page": 100, **(params or {})}
+        while url:
+            response = await self.get(url, params=params)
+            if response.status != 200:
+                raise RuntimeError(f"Failed to fetch {url}: {response.status}")
+            items.extend(response.data or [])
+            url, params = next_link(response.headers), None
+        return items
+
+    async def graphql_with_errors(self, query, variables=None):
+        """Run a GraphQL query and return (data, errors), data is None if the request failed"""
+        response = await self.request("POST", GRAPHQL_URL, json_body={"query": query, "variables": variables or {}})
+        if response.status != 200 or not response.data:
+            print(f"❌ GraphQL request failed: {response.status}")
+            return None, []
+        return response.data.get("data"), response.data.get("errors") or []
+
+    async def graphql(self, query, variables=None):
+        """Run a GraphQL query and return its data, or None if the request failed"""
+        data, errors = await self.graphql_with_errors(query, variables)
+
+        # Missing objects come back as null with a NOT_FOUND error, callers handle those
+        errors = [e for e in errors if e.get("type") != "NOT_FOUND"]
+        if errors:
+            print(f"⚠️ GraphQL errors: {[e.get('message') for e in errors[:3]]}")
+
+        return data
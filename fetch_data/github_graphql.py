@@ -0,0 +1,205 @@
+import asyncio
+import os
+
+from github_search import SEARCH_RESULT_CAP, split_window
+
+# GraphQL backend for fetching merged PRs together with their comment and
+# review authors. One search query returns a whole page of PRs (50 by default)
+# with the first 100 comments and reviews of each, so most PRs cost a fraction
+# of a request instead of two REST calls. Only PRs with more than 100 comments
+# or reviews need follow-up queries for the rest of those connections.
+#
+# fetch_users() looks up many user profiles in one query, with one aliased
+# user(login:) field per login. User.email needs the user:email or read:user
+# scope (REST returns public emails without any), so user_fields() checks once
+# which fields the token can read and the lookups fall back to locations only.
+
+PAGE_SIZE = int(os.getenv("GRAPHQL_PAGE_SIZE", "50"))
+
+# Logins looked up per user query
+USER_BATCH_SIZE = int(os.getenv("GRAPHQL_USER_BATCH", "100"))
+
+# Profile fields read per user, email only with a user:email or read:user token
+USER_FIELDS = ("location", "email")
+
+PR_SEARCH_QUERY = """
+query($q: String!, $first: Int!, $after: String) {
+  search(query: $q, type: ISSUE, first: $first, after: $after) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+        number
+        title
+        createdAt
+        updatedAt
+        mergedAt
+        author { login }
+        comments(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { author { login } }
+        }
+        reviews(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { author { login } }
+        }
+      }
+    }
+  }
+}
+"""
+
+# %s is filled in with the connection name, "comments" or "reviews"
+PR_CONNECTION_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      %s(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } }
+      }
+    }
+  }
+}
+"""
+
+
+def connection_logins(connection):
+    """Collect the author logins of a comments/reviews connection page"""
+    return {
+        node["author"]["login"]
+        for node in connection["nodes"]
+        if node and node.get("author") and node["author"].get("login")
+    }
+
+
+async def fetch_remaining_logins(client, owner, repo, number, connection_name, page_info):
+    """Follow the cursor of a PR's comments/reviews connection past its first page"""
+    logins = set()
+    query = PR_CONNECTION_QUERY % connection_name
+
+    while page_info["hasNextPage"]:
+        data = await client.graphql(query, {
+            "owner": owner,
+            "name": repo,
+            "number": number,
+            "after": page_info["endCursor"],
+        })
+        if not data or not data["repository"] or not data["repository"]["pullRequest"]:
+            break
+
+        connection = data["repository"]["pullRequest"][connection_name]
+        logins |= connection_logins(connection)
+        page_info = connection["pageInfo"]
+
+    return logins
+
+
+async def normalize_pr(client, owner, repo, node):
+    """Turn a PullRequest node into the same shape the REST path works with"""
+    commenters = connection_logins(node["comments"])
+    reviewers = connection_logins(node["reviews"])
+
+    if node["comments"]["pageInfo"]["hasNextPage"]:
+        commenters |= await fetch_remaining_logins(
+            client, owner, repo, node["number"], "comments", node["comments"]["pageInfo"]
+        )
+    if node["reviews"]["pageInfo"]["hasNextPage"]:
+        reviewers |= await fetch_remaining_logins(
+            client, owner, repo, node["number"], "reviews", node["reviews"]["pageInfo"]
+        )
+
+    return {
+        "number": node["number"],
+        "title": node["title"],
+        "user": {"login": node["author"]["login"]} if node.get("author") else None,
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "merged_at": node["mergedAt"],
+        "commenters": commenters,
+        "reviewers": reviewers,
+    }
+
+
+async def search_merged_prs(client, owner, repo, since, until, qualifiers=""):
+    """Yield pages of merged PRs created between since and until, with their
+    comment and review authors already filled in. Extra search qualifiers such
+    as updated:>=... can be passed in for incremental refreshes"""
+    # Oldest first, so a crawl can be resumed from the newest created date it reached
+    query = f"repo:{owner}/{repo} is:pr is:merged created:{since}..{until} sort:created-asc {qualifiers}".strip()
+    cursor = None
+
+    while True:
+        data = await client.graphql(PR_SEARCH_QUERY, {"q": query, "first": PAGE_SIZE, "after": cursor})
+        if not data:
+            raise RuntimeError(f"GraphQL search failed for '{query}'")
+        search = data["search"]
+
+        # Search is capped at 1000 results, split the window like the REST search does
+        if cursor is None and search["issueCount"] > SEARCH_RESULT_CAP and since < until:
+            for sub_since, sub_until in split_window(since, until):
+                async for page in search_merged_prs(client, owner, repo, sub_since, sub_until, qualifiers):
+                    yield page
+            return
+
+        nodes = [node for node in search["nodes"] if node and "number" in node]
+        if nodes:
+            yield await asyncio.gather(*(normalize_pr(client, owner, repo, node) for node in nodes))
+
+        if not search["pageInfo"]["hasNextPage"]:
+            return
+        cursor = search["pageInfo"]["endCursor"]
+
+
+def users_query(count, fields=USER_FIELDS):
+    """Query with one aliased user(login:) field per login, u0 .. u<count-1>"""
+    variables = ", ".join(f"$l{i}: String!" for i in range(count))
+    selection = " ".join(fields)
+    lines = "\n".join(f"  u{i}: user(login: $l{i}) {{ {selection} }}" for i in range(count))
+    return f"query({variables}) {{\n{lines}\n}}"
+
+
+async def user_fields(client):
+    """USER_FIELDS if the token can read them, ("location",) if it lacks the scope
+    for emails. Raises RuntimeError if not even locations can be looked up"""
+    data = await client.graphql("query { viewer { login } }")
+    if not data:
+        raise RuntimeError("GraphQL is not available, check GITHUB_TOKEN")
+    login = data["viewer"]["login"]
+
+    for fields in (USER_FIELDS, ("location",)):
+        data, errors = await client.graphql_with_errors(users_query(1, fields), {"l0": login})
+        if data and data.get("u0") is not None and not errors:
+            return fields
+        if not any(error.get("type") == "INSUFFICIENT_SCOPES" for error in errors):
+            break
+    messages = [error.get("message") for error in errors[:3]]
+    raise RuntimeError(f"GraphQL user lookup does not work with this token: {messages}")
+
+
+async def fetch_users(client, logins, fields=USER_FIELDS):
+    """Look up the location (and email, if in fields) of up to USER_BATCH_SIZE logins
+    in one query. Returns {login: {"location", "email"}}, with None for logins that
+    do not exist and for emails that are hidden or not requested"""
+    logins = list(logins)
+    data, errors = await client.graphql_with_errors(
+        users_query(len(logins), fields), {f"l{i}": login for i, login in enumerate(logins)}
+    )
+    if data is None:
+        raise RuntimeError(f"GraphQL user lookup failed for {len(logins)} logins")
+
+    # Only an alias with a NOT_FOUND error is a missing user. Anything else (e.g.
+    # INSUFFICIENT_SCOPES) fails the whole batch, so it is not cached as "not found"
+    not_found = {error["path"][0] for error in errors if error.get("type") == "NOT_FOUND" and error.get("path")}
+    other = [error for error in errors if error.get("type") != "NOT_FOUND"]
+    if other:
+        raise RuntimeError(f"GraphQL user lookup failed: {[error.get('message') for error in other[:3]]}")
+
+    users = {}
+    for i, login in enumerate(logins):
+        user = data.get(f"u{i}")
+        if user is None and f"u{i}" not in not_found:
+            raise RuntimeError(f"GraphQL user lookup returned no data for {login}")
+        # GraphQL returns "" for hidden emails where REST returns null
+        users[login] = {"location": user["location"], "email": user.get("email") or None} if user else None
+    return users
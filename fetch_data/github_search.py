@@ -0,0 +1,148 @@
+import math
+from datetime import datetime, timedelta
+
+# Helpers that page through PRs/issues created inside a time window.
+#
+# search_created_window() uses the Search API with a created:since..until
+# qualifier, so we only ever download items that are inside the window. The
+# Search API stops at 1000 results per query, so windows that are over the cap
+# are split in half recursively until every sub-range fits.
+#
+# scan_by_created() is the fallback for the plain list endpoints (/pulls,
+# /issues). It sorts by created date, which makes stopping at the start of
+# the window reliable. scan_updated_since() does the same for incremental
+# refreshes, sorting by updated date and stopping at the last high-water mark.
+# Both take a `position` dict holding the API page to start from ("page",
+# default 1). It is moved past each page before the page is yielded, so a
+# caller that checkpoints it after handling a page resumes right after it.
+#
+# All of them raise RuntimeError when a page cannot be fetched, so callers never
+# mistake a partial result for a complete one.
+
+SEARCH_URL = "https://api.github.com/search/issues"
+SEARCH_RESULT_CAP = 1000
+PER_PAGE = 100
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def parse_date(value):
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def format_date(value):
+    return value.strftime(DATE_FORMAT)
+
+
+def split_window(since, until):
+    """Split a since..until window into two halves that do not overlap"""
+    start, end = parse_date(since), parse_date(until)
+    middle = start + (end - start) / 2
+    middle = middle.replace(microsecond=0)
+    return (since, format_date(middle)), (format_date(middle + timedelta(seconds=1)), until)
+
+
+async def search_created_window(client, query, since, until):
+    """Yield pages of search results for `query` created between since and until"""
+    params = {
+        "q": f"{query} created:{since}..{until}",
+        "sort": "created",
+        "order": "asc",
+        "per_page": PER_PAGE,
+    }
+
+    response = await client.get(SEARCH_URL, params={**params, "page": 1})
+    if response.status != 200:
+        raise RuntimeError(f"Search failed for '{params['q']}': {response.status}")
+
+    total_count = response.data["total_count"]
+
+    # Too many results for one query, split the window and search each half
+    if total_count > SEARCH_RESULT_CAP and parse_date(until) > parse_date(since):
+        for sub_since, sub_until in split_window(since, until):
+            async for page in search_created_window(client, query, sub_since, sub_until):
+                yield page
+        return
+
+    if response.data.get("incomplete_results"):
+        print(f"⚠️ Search results incomplete for '{params['q']}'")
+
+    if response.data["items"]:
+        yield response.data["items"]
+
+    last_page = math.ceil(min(total_count, SEARCH_RESULT_CAP) / PER_PAGE)
+    for page in range(2, last_page + 1):
+        response = await client.get(SEARCH_URL, params={**params, "page": page})
+        if response.status != 200:
+            raise RuntimeError(f"Search failed for '{params['q']}' page {page}: {response.status}")
+        if not response.data["items"]:
+            return
+        yield response.data["items"]
+
+
+async def scan_by_created(client, url, since, until, params=None, position=None):
+    """Yield pages from a list endpoint sorted by created date, newest first,
+    keeping only items created inside the window"""
+    params = {
+        **(params or {}),
+        "per_page": PER_PAGE,
+        "sort": "created",
+        "direction": "desc",
+    }
+
+    position = {} if position is None else position
+    page = position.get("page", 1)
+    while True:
+        response = await client.get(url, params={**params, "page": page})
+        if response.status != 200:
+            raise RuntimeError(f"Failed to fetch {url} page {page}: {response.status}")
+
+        items = response.data
+        if not items:
+            return  # No more data
+
+        in_window = [item for item in items if since <= item["created_at"] <= until]
+        position["page"] = page + 1
+        if in_window:
+            yield in_window
+
+        # Items are sorted newest first, once we pass the start of the window we are done
+        if items[-1]["created_at"] < since:
+            return
+
+        page += 1
+
+
+async def scan_updated_since(client, url, since, until, updated_since, params=None, position=None):
+    """Yield pages from a list endpoint sorted by updated date, newest first,
+    keeping only items created inside the window and updated after updated_since"""
+    params = {
+        **(params or {}),
+        "per_page": PER_PAGE,
+        "sort": "updated",
+        "direction": "desc",
+    }
+
+    position = {} if position is None else position
+    page = position.get("page", 1)
+    while True:
+        response = await client.get(url, params={**params, "page": page})
+        if response.status != 200:
+            raise RuntimeError(f"Failed to fetch {url} page {page}: {response.status}")
+
+        items = response.data
+        if not items:
+            return  # No more data
+
+        changed = [
+            item for item in items
+            if since <= item["created_at"] <= until and item["updated_at"] >= updated_since
+        ]
+        position["page"] = page + 1
+        if changed:
+            yield changed
+
+        # Everything after this page was last updated before the mark
+        if items[-1]["updated_at"] < updated_since:
+            return
+
+        page += 1
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+# On-disk cache of GitHub GET responses for conditional requests.
+#
+# Every 200 response that carries an ETag or Last-Modified header is stored
+# together with its body, one file per URL + params. Next time the same request
+# is made we send If-None-Match / If-Modified-Since, and if GitHub answers 304
+# the stored body is used. 304 responses do not count against the rate limit.
+
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+
+
+class ResponseCache:
+    """ETag / Last-Modified response cache keyed by URL and params"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, url, params):
+        key = json.dumps([url, sorted((params or {}).items())], default=str)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        # Shard by the first two characters so no directory gets too big
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def get(self, url, params=None):
+        """Return the stored entry for a request, or None"""
+        path = self._path(url, params)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Half-written or corrupt entry, treat it as a miss
+            return None
+
+    def put(self, url, params, headers, data):
+        """Store a response if it has validator headers"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        path = self._path(url, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so a crash never leaves a partial entry
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # Keep the Link header too, pagination needs it when serving a 304
+            json.dump({"etag": etag, "last_modified": last_modified, "link": headers.get("Link"), "data": data}, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def validator_headers(entry):
+        """Conditional request headers for a stored entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
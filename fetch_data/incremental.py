@@ -0,0 +1,59 @@
+import os
+
+from cache_store import open_cache
+
+# Incremental refresh support.
+#
+# Each crawl unit (entity + repo + timeframe) keeps a high-water mark of the
+# newest item it has seen, e.g. the latest updated_at of PRs/issues or the
+# latest commit date and SHA. The next run only asks GitHub for items newer
+# than that mark and merges them into what is already stored.
+
+# Set INCREMENTAL=0 to ignore the marks and refetch everything
+INCREMENTAL = os.getenv("INCREMENTAL", "1") != "0"
+
+
+class Watermarks:
+    """High-water marks per entity/repo/timeframe, stored in the cache store"""
+
+    def __init__(self):
+        self.store = open_cache("watermarks")
+
+    @staticmethod
+    def key(entity, owner, repo, timeframe):
+        return f"{entity}:{owner}/{repo}:{timeframe}"
+
+    def get(self, entity, owner, repo, timeframe):
+        """Return the stored marks (a dict) or None if this unit was never fetched"""
+        return self.store.get(self.key(entity, owner, repo, timeframe))
+
+    def set(self, entity, owner, repo, timeframe, **marks):
+        """Replace the marks of a unit and save them right away"""
+        key = self.key(entity, owner, repo, timeframe)
+        self.store[key] = marks
+        self.store.flush()
+
+    def advance(self, entity, owner, repo, timeframe, **marks):
+        """Move the marks forward, never backwards, and save them right away"""
+        key = self.key(entity, owner, repo, timeframe)
+        current = self.store.get(key, {})
+        for name, value in marks.items():
+            if value is not None and (current.get(name) is None or value > current[name]):
+                current[name] = value
+        self.store[key] = current
+        self.store.flush()
+        return current
+
+
+def latest(values, default=None):
+    """Largest non-empty value, used to find the newest timestamp on a page"""
+    values = [value for value in values if value]
+    return max(values) if values else default
+
+
+def merge_rows(existing, new, key_index):
+    """Merge new rows into existing ones, replacing rows with the same key"""
+    merged = {row[key_index]: row for row in existing}
+    for row in new:
+        merged[row[key_index]] = row
+    return list(merged.values())
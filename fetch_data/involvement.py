@@ -0,0 +1,23 @@
+import pandas as pd
+
+# Summaries of Swedish involvement shared by the PR and issue filter scripts.
+#
+# The YES/NO flag columns are converted to booleans once, so the per-group
+# counts are plain built-in sums inside a single groupby instead of a Python
+# lambda per group and column.
+
+
+def involvement_flags(df, flag_columns):
+    """Boolean version of the YES/NO flag columns"""
+    return pd.DataFrame({column: df[column].eq("YES") for column in flag_columns}, index=df.index)
+
+
+def involvement_summary(df, flags, by, id_column, total_label, time_column):
+    """Per group: number of items, how many of them carry each flag, and the mean time"""
+    aggregations = {total_label: (id_column, "count")}
+    aggregations.update({column: (column, "sum") for column in flags.columns})
+    aggregations[time_column] = (time_column, "mean")
+
+    data = pd.concat([df[[by, id_column, time_column]], flags], axis=1)
+    return data.groupby(by).agg(**aggregations)
+
@@ -1,18 +1,25 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Load the data
-file_path = r'c:\Users\reyha\Desktop\UBC\Term 3 2025\419 o Data Mining\DataMining\COSC419O-DataMining\fetch_data\swedish_contributor_issues.csv'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from involvement import involvement_flags, involvement_summary
+
+# Load the data (set SWEDISH_ISSUES_FILE to read another file)
+file_path = os.getenv("SWEDISH_ISSUES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "swedish_contributor_issues.csv"))
 df = pd.read_csv(file_path)
 
+# Convert the YES/NO columns to booleans once
+flags = involvement_flags(df, ['Opened by Swedish', 'Commented by Swedish'])
+
 # Filter issues with Swedish contributor involvement
-swedish_involvement = df[(df['Opened by Swedish'] == 'YES') | 
-                        (df['Commented by Swedish'] == 'YES')]
+swedish_involvement = df[flags.any(axis=1)]
 
 # Create separate dataframes for each type of involvement
-opened_by_swedish = df[df['Opened by Swedish'] == 'YES']
-commented_by_swedish = df[df['Commented by Swedish'] == 'YES']
+opened_by_swedish = df[flags['Opened by Swedish']]
+commented_by_swedish = df[flags['Commented by Swedish']]
 
 # Summary statistics
 total_issues = len(df)
@@ -40,24 +47,20 @@ if not df.empty:
 
 # Analysis by repository
 if not swedish_involvement.empty:
-    repo_stats = swedish_involvement.groupby('Repository').agg({
-        'Issue Number': 'count',
-        'Opened by Swedish': lambda x: (x == 'YES').sum(),
-        'Commented by Swedish': lambda x: (x == 'YES').sum(),
-        'Resolution Time (Days)': 'mean'
-    }).rename(columns={'Issue Number': 'Total Issues'})
+    repo_stats = involvement_summary(
+        swedish_involvement, flags.loc[swedish_involvement.index], 'Repository',
+        'Issue Number', 'Total Issues', 'Resolution Time (Days)'
+    )
     
     print("\nSwedish Contribution by Repository:")
     print(repo_stats)
 
 # Analysis by time frame
 if not swedish_involvement.empty:
-    time_stats = swedish_involvement.groupby('Time Frame').agg({
-        'Issue Number': 'count',
-        'Opened by Swedish': lambda x: (x == 'YES').sum(),
-        'Commented by Swedish': lambda x: (x == 'YES').sum(),
-        'Resolution Time (Days)': 'mean'
-    }).rename(columns={'Issue Number': 'Total Issues'})
+    time_stats = involvement_summary(
+        swedish_involvement, flags.loc[swedish_involvement.index], 'Time Frame',
+        'Issue Number', 'Total Issues', 'Resolution Time (Days)'
+    )
     
     print("\nSwedish Contribution by Time Frame:")
     print(time_stats)
@@ -1,41 +1,26 @@
-import aiohttp
 import asyncio
-import json
 import os
+import sys
 import time
 import pandas as pd
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {
-    "Authorization": f"token {TOKEN}" if TOKEN else "",
-    "Accept": "application/vnd.github.v3+json"
-}
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cache_store import open_cache
+from checkpoint import Checkpoint
+from contributions import ISSUE_COLUMNS, REPOSITORIES, TIME_FRAMES, issue_details as summarize_issue, issue_row, save_table
+from contributor_index import ContributorIndex
+from github_client import GitHubClient
+from github_search import search_created_window, scan_by_created, scan_updated_since
+from incremental import INCREMENTAL, Watermarks, latest, merge_rows
 
-# Define repositories
-repositories = [
-    ("vuejs", "vue"),
-    ("electron", "electron"),
-    ("freeCodeCamp", "freeCodeCamp"),
-    ("kubernetes", "kubernetes"),
-    ("n8n-io", "n8n"),
-    ("pytorch", "pytorch"),
-    ("facebook", "react"),
-    ("apache", "superset"),
-    ("tensorflow", "tensorflow"),
-    ("microsoft", "vscode"),
-    ("ytdl-org", "youtube-dl"),
-]
+# "search" uses the Search API with a created:since..until window,
+# "scan" pages through the closed issue list sorted by created date
+FETCH_MODE = os.getenv("FETCH_MODE", "search")
 
-# Time periods
-time_frames = [
-    ("2018-01-01T00:00:00Z", "2019-12-31T23:59:59Z", "2018_2019"),
-    ("2020-01-01T00:00:00Z", "2022-06-30T23:59:59Z", "2020_2022"),
-    ("2022-06-01T00:00:00Z", "2024-06-30T23:59:59Z", "2022_2024"),
-]
+# Repositories and time periods, shared with swedish_pull_request.py and event_crawler.py
+repositories = REPOSITORIES
+time_frames = TIME_FRAMES
 
 # Load Swedish users
 swedish_users = set()
@@ -46,155 +31,128 @@ if os.path.exists(filename):
 
 print(f"✅ Loaded {len(swedish_users)} unique Swedish contributors.")
 
-# Load cached issue data
-cache_file = "cached_issues.json"
-if os.path.exists(cache_file):
-    with open(cache_file, "r", encoding="utf-8") as f:
-        cached_issue_data = json.load(f)
-else:
-    cached_issue_data = {}
+# Cached issue rows per repo/timeframe and details per issue, stored in SQLite.
+# The old JSON cache files are migrated into the store on the first run.
+cached_issue_data = open_cache("issues", "cached_issues.json")
+print(f"📁 Loaded cache with {len(cached_issue_data)} issue records.")
 
-print(f"📁 Loaded {len(cached_issue_data)} cached issue records.")
+cached_issue_details = open_cache("issue_details", "cached_issue_details.json")
+print(f"📁 Loaded cache with {len(cached_issue_details)} issue details.")
 
-# Create detailed cache file for individual issues
-detailed_cache_file = "cached_issue_details.json"
-if os.path.exists(detailed_cache_file):
-    with open(detailed_cache_file, "r", encoding="utf-8") as f:
-        cached_issue_details = json.load(f)
-else:
-    cached_issue_details = {}
+# Raw authors/commenters per issue, for flagging other cohorts offline
+contributor_index = ContributorIndex()
 
-print(f"📁 Loaded {len(cached_issue_details)} cached issue details.")
+# High-water marks for incremental refreshes
+watermarks = Watermarks()
 
-# Rate limit tracking
-rate_limit_remaining = 5000
-rate_limit_reset_time = 0
-
-async def check_rate_limit(session):
-    """Check GitHub API rate limit status"""
-    global rate_limit_remaining, rate_limit_reset_time
-    
-    try:
-        async with session.get("https://api.github.com/rate_limit") as response:
-            if response.status == 200:
-                data = await response.json()
-                rate_limit_remaining = data["resources"]["core"]["remaining"]
-                rate_limit_reset_time = data["resources"]["core"]["reset"]
-                
-                print(f"🔄 Rate limit remaining: {rate_limit_remaining}")
-                return rate_limit_remaining
-            else:
-                print(f"⚠️ Failed to check rate limit: {response.status}")
-                return 0
-    except Exception as e:
-        print(f"⚠️ Error checking rate limit: {e}")
-        return 0
-
-async def wait_for_rate_limit(session):
-    """Wait if rate limit is approaching zero"""
-    await check_rate_limit(session)
-    
-    if rate_limit_remaining < 10:
-        current_time = time.time()
-        sleep_time = max(rate_limit_reset_time - current_time + 10, 0)
-        
-        if sleep_time > 0:
-            print(f"🚨 Rate limit almost reached! Sleeping for {sleep_time:.1f} seconds")
-            await asyncio.sleep(sleep_time)
-            await check_rate_limit(session)
-
-async def fetch_issues_for_timeframe(session, owner, repo, since, until, timeframe):
+async def fetch_issues_for_timeframe(client, owner, repo, since, until, timeframe):
     """Fetch issues for a specific repository and timeframe"""
     cache_key = f"{owner}_{repo}_{timeframe}"
+    watermark = watermarks.get("issues", owner, repo, timeframe)
     
     # Check if we have this data cached
-    if cache_key in cached_issue_data:
+    if cache_key in cached_issue_data and (not INCREMENTAL or watermark is None):
+        # Without a high-water mark (e.g. migrated caches) there is nothing to refresh from
         print(f"⚡ Using cached data for {owner}/{repo} ({timeframe})")
         return cached_issue_data[cache_key]
     
-    print(f"🔍 Fetching issues for {owner}/{repo} ({timeframe})...")
+    # Incremental refresh: only issues updated since the last run
+    updated_since = None
+    if INCREMENTAL and watermark and cache_key in cached_issue_data:
+        updated_since = watermark.get("updated_at")
+    
+    # Resume an interrupted crawl of this timeframe from its last finished page
+    checkpoint = Checkpoint(f"issues:{owner}/{repo}:{timeframe}")
+    meta = checkpoint.meta()
+    if meta and meta["mode"] == FETCH_MODE:
+        updated_since = meta["updated_since"]
+        oldest, newest = checkpoint.created_span()
+        # The REST scan modes continue from the API page after the last finished one
+        position = {"page": meta.get("api_page", 1)}
+        print(f"⏯️ Resuming issues for {owner}/{repo} ({timeframe}) after {len(checkpoint.rows())} saved issues...")
+    else:
+        checkpoint.clear()
+        checkpoint.start(mode=FETCH_MODE, updated_since=updated_since)
+        oldest = newest = None
+        position = {"page": 1}
+        if updated_since:
+            print(f"🔄 Refreshing issues for {owner}/{repo} ({timeframe}) updated since {updated_since}...")
+        else:
+            print(f"🔍 Fetching issues for {owner}/{repo} ({timeframe})...")
     
-    # Use API date filtering to reduce the number of issues fetched
     url = f"https://api.github.com/repos/{owner}/{repo}/issues"
-    params = {
-        "state": "closed",
-        "per_page": 100,
-        "sort": "updated",
-        "direction": "desc"
-    }
+    if FETCH_MODE == "search":
+        # Only closed issues created inside the window (oldest first), split to stay under the search cap
+        query = f"repo:{owner}/{repo} is:issue is:closed"
+        if updated_since:
+            query += f" updated:>={updated_since}"
+        pages = search_created_window(client, query, newest or since, until)
+    elif updated_since:
+        # Closed issues sorted by updated date, stop once we pass the high-water mark
+        pages = scan_updated_since(client, url, since, until, updated_since, params={"state": "closed"}, position=position)
+    else:
+        # Closed issues sorted by created date (newest first), stop once we pass the start of the window
+        pages = scan_by_created(client, url, since, oldest or until, params={"state": "closed"}, position=position)
     
-    all_issues = []
-    page = 1
-    stop_fetching = False
+    all_issues = checkpoint.rows()
+    done = {row[2] for row in all_issues}
+    page_number = checkpoint.next_page()
+    # Issues that changed since the last run need their details refetched
+    refresh = updated_since is not None
     
-    while not stop_fetching:
-        await wait_for_rate_limit(session)
-        
-        try:
-            current_params = {**params, "page": page}
-            async with session.get(url, params=current_params) as response:
-                if response.status == 200:
-                    issues = await response.json()
-                    
-                    if not issues:
-                        break  # No more data
-                    
-                    # Process issues and check if we've gone past our time window
-                    all_before_timeframe = True
-                    
-                    for issue in issues:
-                        # Skip pull requests (they appear in the issues endpoint)
-                        if "pull_request" in issue:
-                            continue
-                            
-                        created_at = issue["created_at"]
-                        
-                        # If issue was created before our time frame, skip it
-                        if created_at < since:
-                            continue
-                            
-                        # If issue was created after our time frame, skip it
-                        if created_at > until:
-                            continue
-                            
-                        all_before_timeframe = False
-                        
-                        # Process this issue
-                        issue_data = await process_issue(session, owner, repo, issue, timeframe)
-                        if issue_data:
-                            all_issues.append(issue_data)
-                    
-                    # If all issues in this page are before our time frame, we can stop
-                    if all_before_timeframe and page > 1:
-                        stop_fetching = True
-                    else:
-                        page += 1
-                        
-                elif response.status == 403:
-                    # Rate limited
-                    retry_after = int(response.headers.get("Retry-After", "60"))
-                    print(f"🚨 Rate limited! Waiting for {retry_after} seconds...")
-                    await asyncio.sleep(retry_after)
-                    
-                else:
-                    print(f"❌ Failed to fetch issues: {response.status}")
-                    break
+    try:
+        async for page_issues in pages:
+            # Issues on the boundary of a resumed window were already saved
+            page_issues = [issue for issue in page_issues if issue["number"] not in done]
+            if not page_issues:
+                continue
+            
+            rows = []
+            for issue in page_issues:
+                # Skip pull requests (they appear in the issues endpoint)
+                if "pull_request" in issue:
+                    continue
+                
+                # Process this issue
+                issue_data = await process_issue(client, owner, repo, issue, timeframe, refresh)
+                if issue_data:
+                    rows.append(issue_data)
+            
+            # Details first, then the page, so a resumed run never points at missing details
+            cached_issue_details.flush()
+            contributor_index.flush()
+            created = [issue["created_at"] for issue in page_issues]
+            checkpoint.commit_page(
+                page_number, rows,
+                oldest=min(created), newest=max(created),
+                updated_at=latest(issue.get("updated_at") for issue in page_issues)
+            )
+            checkpoint.update(api_page=position["page"])
+            page_number += 1
+            all_issues.extend(rows)
+            done.update(issue["number"] for issue in page_issues)
                     
-        except Exception as e:
-            print(f"❌ Error fetching issues: {e}")
-            await asyncio.sleep(5)  # Short delay on error
+    except Exception as e:
+        # Leave the cache and mark alone, the next run resumes from the checkpoint
+        raise RuntimeError(f"Error fetching issues for {owner}/{repo} ({timeframe}), rerun to resume: {e}") from e
+    
+    latest_update = latest(entry.get("updated_at") for _, entry in checkpoint.pages())
+    
+    if updated_since:
+        # Merge the changed issues into the cached rows, keyed by issue number
+        all_issues = merge_rows(cached_issue_data.get(cache_key, []), all_issues, key_index=2)
+        print(f"✅ {owner}/{repo} ({timeframe}): refreshed, {len(all_issues)} issues in total")
     
     # Cache the results for this timeframe
     cached_issue_data[cache_key] = all_issues
-    with open(cache_file, "w", encoding="utf-8") as f:
-        json.dump(cached_issue_data, f)
+    cached_issue_data.flush()
+    watermarks.advance("issues", owner, repo, timeframe, updated_at=latest_update)
+    checkpoint.clear()
     
     return all_issues
 
-async def process_issue(session, owner, repo, issue, timeframe):
-    """Process a single issue and fetch its details"""
-    global cached_issue_details
-    
+async def process_issue(client, owner, repo, issue, timeframe, refresh=False):
+    """Process a single issue and fetch its details (refetching cached ones if refresh is set)"""
     issue_number = issue["number"]
     author = issue["user"]["login"] if issue["user"] else "ghost"
     created_at = issue["created_at"]
@@ -208,24 +166,11 @@ async def process_issue(session, owner, repo, issue, timeframe):
     issue_cache_key = f"{owner}_{repo}_{issue_number}"
     
     # Check if we already have cached data for this issue
-    if issue_cache_key in cached_issue_details:
+    if issue_cache_key in cached_issue_details and not refresh:
         issue_details = cached_issue_details[issue_cache_key]
         
         # Return formatted data for this issue
-        return [
-            timeframe,
-            repo,
-            issue_number,
-            issue_details["title"],
-            author,
-            "YES" if author in swedish_users else "NO",
-            issue_details["comment_count"],
-            "YES" if issue_details["commented_by_swedish"] else "NO",
-            issue_details["resolution_time"]
-        ]
-    
-    # Fetch issue details
-    await wait_for_rate_limit(session)
+        return issue_row(timeframe, repo, issue_number, author, issue_details, swedish_users)
     
     try:
         # Use the REST API to fetch comments
@@ -233,74 +178,44 @@ async def process_issue(session, owner, repo, issue, timeframe):
         
         # Fetch comments
         commenters = set()
-        async with session.get(comments_url) as comments_response:
-            if comments_response.status == 200:
-                comments = await comments_response.json()
-                for comment in comments:
-                    if comment.get("user") and comment["user"].get("login"):
-                        commenters.add(comment["user"]["login"])
+        # Every page, failing instead of caching a partial list as the issue's comments
+        for comment in await client.get_all(comments_url):
+            if comment.get("user") and comment["user"].get("login"):
+                commenters.add(comment["user"]["login"])
         
-        # Check if any Swedish user commented
-        commented_by_swedish = any(user in swedish_users for user in commenters)
-        
-        # Calculate time to close
-        if closed_at:
-            created_time = pd.to_datetime(created_at)
-            closed_time = pd.to_datetime(closed_at)
-            resolution_time = (closed_time - created_time).days
-        else:
-            resolution_time = "Not Closed"
-        
-        # Store issue details in cache
-        issue_details = {
-            "title": issue["title"],
-            "comment_count": len(commenters),
-            "commented_by_swedish": commented_by_swedish,
-            "resolution_time": resolution_time
-        }
+        # Store issue details (Swedish involvement, time to close) in cache
+        issue_details = summarize_issue(issue["title"], created_at, closed_at, commenters, swedish_users)
         
         cached_issue_details[issue_cache_key] = issue_details
-        
-        # Periodically save the cached details
-        if len(cached_issue_details) % 10 == 0:
-            with open(detailed_cache_file, "w", encoding="utf-8") as f:
-                json.dump(cached_issue_details, f)
+        contributor_index.record("issue", repo, issue_number, issue["user"]["login"] if issue["user"] else None, commenters)
         
         # Return formatted data for this issue
-        return [
-            timeframe,
-            repo,
-            issue_number,
-            issue["title"],
-            author,
-            "YES" if author in swedish_users else "NO",
-            len(commenters),
-            "YES" if commented_by_swedish else "NO",
-            resolution_time
-        ]
+        return issue_row(timeframe, repo, issue_number, author, issue_details, swedish_users)
         
     except Exception as e:
-        print(f"❌ Error processing issue {issue_number}: {e}")
-        return None
+        # Propagate, so the page is not checkpointed and the next run fetches it again
+        raise RuntimeError(f"Error processing issue {issue_number}: {e}") from e
 
 async def main():
     """Main function to orchestrate the fetching and processing of data"""
     issue_data = []
     total_tasks = len(repositories) * len(time_frames)
     completed_tasks = 0
+    failed_units = []
     
-    # Create async session
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        # Check rate limit before starting
-        await check_rate_limit(session)
-        
+    # Create the shared GitHub client (tracks rate limits from response headers)
+    async with GitHubClient() as client:
         # Process repositories in parallel with concurrency control
         # Use a semaphore to limit concurrent requests
         semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent repositories
         
+        # A failed unit is reported instead of raised, so the others still finish
         async def process_with_semaphore(owner, repo, since, until, timeframe):
             async with semaphore:
-                return await fetch_issues_for_timeframe(session, owner, repo, since, until, timeframe)
+                try:
+                    return repo, timeframe, await fetch_issues_for_timeframe(client, owner, repo, since, until, timeframe)
+                except Exception as e:
+                    return repo, timeframe, e
         
         # Create tasks
         tasks = []
@@ -311,32 +226,32 @@ async def main():
         
         # Execute tasks with progress tracking
         for i, task in enumerate(asyncio.as_completed(tasks)):
-            try:
-                repo_data = await task
-                issue_data.extend(repo_data)
-                completed_tasks += 1
-                progress = (completed_tasks / total_tasks) * 100
-                print(f"⏳ Progress: {progress:.2f}% ({completed_tasks}/{total_tasks} tasks completed)")
-            except Exception as e:
-                print(f"❌ Task error: {e}")
+            repo, timeframe, repo_data = await task
+            if isinstance(repo_data, Exception):
+                print(f"❌ Task error: {repo_data}")
+                failed_units.append((repo, timeframe))
+                continue
+            issue_data.extend(repo_data)
+            completed_tasks += 1
+            progress = (completed_tasks / total_tasks) * 100
+            print(f"⏳ Progress: {progress:.2f}% ({completed_tasks}/{total_tasks} tasks completed)")
     
-    # Save the final cached issue details
-    with open(detailed_cache_file, "w", encoding="utf-8") as f:
-        json.dump(cached_issue_details, f)
+    # Commit the last batch of cached issue details
+    cached_issue_details.flush()
+    contributor_index.flush()
     
     # Convert to DataFrame
-    df_issues = pd.DataFrame(issue_data, columns=[
-        "Time Frame", "Repository", "Issue Number", "Issue Title", "Author",
-        "Opened by Swedish", "Total Comments", "Commented by Swedish",
-        "Resolution Time (Days)"
-    ])
+    df_issues = pd.DataFrame(issue_data, columns=ISSUE_COLUMNS)
     
-    # Save the results to CSV
+    # Save the results to CSV, failed units keep the rows of the previous run
     output_file = "swedish_contributor_issues.csv"
-    df_issues.to_csv(output_file, index=False)
+    save_table(df_issues, output_file, failed_units)
     
     print(f"\n✅ Data saved to {output_file}")
     print(f"📊 Total issues analyzed: {len(df_issues)}")
+    
+    if failed_units:
+        raise SystemExit(f"❌ {len(failed_units)} of {total_tasks} tasks failed, rerun to resume them")
 
 # Run the async main function
 if __name__ == "__main__":
@@ -352,6 +267,9 @@ if __name__ == "__main__":
         
     except KeyboardInterrupt:
         print("\n⛔ Script interrupted by user")
+        # Exit non-zero, so the pipeline does not record a partial crawl as done
+        sys.exit(130)
         
     except Exception as e:
-        print(f"\n💥 Script error: {e}")
\ No newline at end of file
+        print(f"\n💥 Script error: {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,281 @@
+import argparse
+import ast
+import asyncio
+import glob
+import hashlib
+import os
+import sys
+import time
+from collections import namedtuple
+from fnmatch import fnmatch
+
+from cache_store import open_cache
+
+# End-to-end runner for the scripts in this directory.
+#
+# Every stage declares the files it reads and writes (glob patterns, relative
+# to this directory, which is also the working directory of every stage). A
+# stage depends on every stage whose outputs match one of its inputs, so the
+# commit, PR and issue branches run concurrently. Before running a stage its
+# inputs, its code, the environment it gets and the config variables it reads
+# are hashed (the code being the script plus every module of this directory
+# it imports, directly or not); if the hash matches the last successful run and its outputs are
+# still there, the stage is skipped. Changing a config variable or an input
+# therefore only reruns what is downstream of it.
+#
+# Stages without file inputs (the GitHub crawls) are only rerun when their
+# code or config changes, use --force to refresh them.
+#
+#   python pipeline.py                      # everything
+#   python pipeline.py sampling             # sampling and what it depends on
+#   python pipeline.py --force fetch_prs    # refetch PRs and rerun what changed downstream
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shared by unique_commits.py (writes it) and seperate_authors.py (reads it)
+COMMIT_USERS_FILE = "commit_users.csv"
+
+# Cache and storage settings read by several stages
+SHARED_CONFIG = ("CACHE_DB", "INCREMENTAL", "HTTP_CACHE", "COMMITS_DATASET")
+
+# `optional` outputs link stages like outputs, but a stage can succeed without
+# writing them (e.g. plots that are only drawn when there is data). `code` is
+# for files the script reads as code without importing them.
+Stage = namedtuple("Stage", ["name", "script", "inputs", "outputs", "optional", "code", "env", "config"])
+
+
+def stage(name, script, inputs=(), outputs=(), optional=(), code=(), env=None, config=()):
+    return Stage(name, script, tuple(inputs), tuple(outputs), tuple(optional), tuple(code), env or {}, tuple(config))
+
+
+STAGES = [
+    # Commits
+    stage(
+        "fetch_commits", "fetch.py",
+        outputs=["*/*_results/commits_*.csv"],
+    ),
+    stage(
+        "unique_commits", "unique_commits.py",
+        inputs=["*/*_results/commits_*.csv"],
+        outputs=[COMMIT_USERS_FILE],
+        env={"COMMIT_USERS_FILE": COMMIT_USERS_FILE},
+        config=["COMMITS_CHUNK_SIZE"],
+    ),
+    stage(
+        "seperate_authors", "seperate_authors.py",
+        inputs=[COMMIT_USERS_FILE, "country_keywords.json"],
+        outputs=["*/*_authors/*_authors_*.csv"],
+        env={"COMMIT_USERS_FILE": COMMIT_USERS_FILE},
+        config=["GRAPHQL_USER_BATCH"],
+    ),
+    stage(
+        "filtering", "filtering.py",
+        inputs=["*/*_results/commits_*.csv", "*/*_authors/*_authors_uk.csv"],
+        outputs=["all_authors_with_commits.csv", "filtered_authors_by_timeframe.csv"],
+    ),
+    stage(
+        "sampling", "sampling.py",
+        inputs=["filtered_authors_by_timeframe.csv"],
+        outputs=["sampled_authors.csv"],
+    ),
+    # Pull requests
+    stage(
+        "fetch_prs", "PRs_sweden/swedish_pull_request.py",
+        inputs=["repos_sweden_users.csv"],
+        outputs=["swedish_contributor_prs.csv"],
+        config=["PR_BACKEND", "FETCH_MODE", "GRAPHQL_PAGE_SIZE"],
+    ),
+    stage(
+        "filter_prs", "PRs_sweden/filter_Swedish_prs.py",
+        inputs=["swedish_contributor_prs.csv"],
+        outputs=["filtered_swedish_prs.csv"],
+        env={"SWEDISH_PRS_FILE": "swedish_contributor_prs.csv"},
+    ),
+    stage(
+        "analyze_prs", "PRs_sweden/analyze_swedish_PRs.py",
+        inputs=["swedish_contributor_prs.csv", "repos_sweden_users.csv"],
+        outputs=["swedish_contributions_over_time.png"],
+        env={"SWEDISH_PRS_FILE": "swedish_contributor_prs.csv", "SWEDISH_USERS_FILE": "repos_sweden_users.csv"},
+    ),
+    # Issues
+    stage(
+        "fetch_issues", "issues_sweden/issues.py",
+        inputs=["repos_sweden_users.csv"],
+        outputs=["swedish_contributor_issues.csv"],
+        config=["FETCH_MODE"],
+    ),
+    stage(
+        "filter_issues", "issues_sweden/filter_issues.py",
+        inputs=["swedish_contributor_issues.csv"],
+        outputs=["filtered_swedish_issues.csv"],
+        # Only drawn when there is Swedish involvement
+        optional=["resolution_time_comparison.png", "swedish_issues_over_time.png"],
+        env={"SWEDISH_ISSUES_FILE": "swedish_contributor_issues.csv"},
+    ),
+]
+
+
+def patterns_overlap(a, b):
+    """Whether two glob patterns can match the same file"""
+    return a == b or fnmatch(a, b) or fnmatch(b, a)
+
+
+def dependencies(stages):
+    """Stage name -> names of the stages producing one of its inputs"""
+    return {
+        consumer.name: [
+            producer.name for producer in stages
+            if producer is not consumer and any(
+                patterns_overlap(output, pattern)
+                for output in producer.outputs + producer.optional for pattern in consumer.inputs
+            )
+        ]
+        for consumer in stages
+    }
+
+
+def expand(pattern):
+    return sorted(glob.glob(os.path.join(BASE_DIR, pattern)))
+
+
+def file_hash(path, digest):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def local_imports(script):
+    """The script and every module of this directory it imports, directly or not"""
+    found = []
+    todo = [script]
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.append(path)
+        with open(os.path.join(BASE_DIR, path), "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            # Scripts in subdirectories import their neighbours and (through sys.path) this directory
+            for name in names:
+                for directory in (os.path.dirname(path), ""):
+                    module = os.path.join(directory, name.split(".")[0] + ".py")
+                    if os.path.exists(os.path.join(BASE_DIR, module)):
+                        todo.append(module)
+                        break
+    return sorted(found)
+
+
+def stage_hash(stage):
+    """Hash of everything that determines a stage's outputs"""
+    digest = hashlib.sha256()
+    for path in local_imports(stage.script) + list(stage.code):
+        digest.update(path.encode())
+        file_hash(os.path.join(BASE_DIR, path), digest)
+    for pattern in stage.inputs:
+        for path in expand(pattern):
+            digest.update(os.path.relpath(path, BASE_DIR).encode())
+            file_hash(path, digest)
+    for name, value in sorted(stage.env.items()):
+        digest.update(f"{name}={value}".encode())
+    for name in stage.config + SHARED_CONFIG:
+        digest.update(f"{name}={os.getenv(name)}".encode())
+    return digest.hexdigest()
+
+
+def outputs_exist(stage):
+    return all(expand(pattern) for pattern in stage.outputs)
+
+
+class Pipeline:
+    """Runs stages as soon as the stages they depend on have finished"""
+
+    def __init__(self, stages=STAGES):
+        self.stages = {stage.name: stage for stage in stages}
+        self.depends_on = dependencies(stages)
+        self.state = open_cache("pipeline")
+
+    def upstream(self, names):
+        """The given stages plus everything they depend on"""
+        selected = set()
+        todo = list(names)
+        while todo:
+            name = todo.pop()
+            if name not in selected:
+                selected.add(name)
+                todo.extend(self.depends_on[name])
+        return selected
+
+    async def run(self, targets=None, force=()):
+        selected = self.upstream(targets) if targets else set(self.stages)
+        tasks = {}
+
+        def task_for(name):
+            if name not in tasks:
+                deps = [task_for(dep) for dep in self.depends_on[name] if dep in selected]
+                tasks[name] = asyncio.ensure_future(self.run_stage(self.stages[name], deps, name in force))
+            return tasks[name]
+
+        for name in self.stages:
+            if name in selected:
+                task_for(name)
+        return dict(zip(tasks, await asyncio.gather(*tasks.values())))
+
+    async def run_stage(self, stage, deps, force):
+        if not all(await asyncio.gather(*deps)):
+            print(f"⏭️ {stage.name}: skipped, an upstream stage failed")
+            return False
+
+        # Hash only once the upstream stages have written this stage's inputs
+        digest = stage_hash(stage)
+        saved = self.state.get(stage.name)
+        if not force and saved and saved["hash"] == digest and outputs_exist(stage):
+            print(f"✅ {stage.name}: up to date")
+            return True
+
+        print(f"▶️ {stage.name}: running {stage.script}")
+        start_time = time.time()
+        # Unbuffered, so the output of long crawls shows up while they run
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(BASE_DIR, stage.script),
+            cwd=BASE_DIR, env={**os.environ, "PYTHONUNBUFFERED": "1", **stage.env},
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=1 << 20
+        )
+        async for line in process.stdout:
+            print(f"[{stage.name}] {line.decode('utf-8', errors='replace').rstrip()}", flush=True)
+        await process.wait()
+
+        if process.returncode != 0:
+            print(f"❌ {stage.name}: failed with exit code {process.returncode}")
+            return False
+
+        self.state[stage.name] = {"hash": digest, "finished_at": time.time()}
+        self.state.flush()
+        print(f"✅ {stage.name}: done in {time.time() - start_time:.1f} seconds")
+        return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose inputs have not changed")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE", help="rerun a stage even if it is up to date")
+    parser.add_argument("--list", action="store_true", help="show the stages and their dependencies")
+    args = parser.parse_args()
+
+    pipeline = Pipeline()
+    unknown = [name for name in args.stages + args.force if name not in pipeline.stages]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (choose from {', '.join(pipeline.stages)})")
+
+    if args.list:
+        for name, deps in pipeline.depends_on.items():
+            print(f"{name} <- {', '.join(deps) or '-'}")
+    else:
+        results = asyncio.run(pipeline.run(args.stages, set(args.force)))
+        sys.exit(0 if all(results.values()) else 1)
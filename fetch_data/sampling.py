@@ -1,17 +1,26 @@
-import random
-import numpy as np
 import pandas as pd
+from stratified_sampling import stratified_sample
+
+# Columns that define a stratum, e.g. ['repository', 'primary_timeframe']
+STRATA = ['primary_timeframe']
+
+# "fixed" uses sample_sizes below, "proportional" and "neyman" split SAMPLE_SIZE over the strata
+ALLOCATION = 'fixed'
+SAMPLE_SIZE = 47
+NEYMAN_VARIABLE = 'total_commits'
+
+SEED = 42  # Set for reproducibility
 
 if __name__ == '__main__':
-    
+
     authors = pd.read_csv('filtered_authors_by_timeframe.csv')
-    
+
     # Display the total count and distribution by primary timeframe
     print(f"Total number of authors: {len(authors)}")
     timeframe_counts = authors['primary_timeframe'].value_counts()
     print("Distribution by primary timeframe:")
     print(timeframe_counts)
-    
+
     # Define how many entries to sample from each timeframe
     # You can adjust these numbers based on your requirements
     sample_sizes = {
@@ -20,35 +29,23 @@ if __name__ == '__main__':
         '2022_2024': 7,
         # Add other timeframe categories if needed
     }
-    
-    # Create an empty dataframe to store the combined samples
-    combined_sample = pd.DataFrame()
-    
-    # Sample from each timeframe
-    for timeframe, size in sample_sizes.items():
-        # Filter authors by timeframe
-        timeframe_authors = authors[authors['primary_timeframe'] == timeframe]
-        
-        # Check if we have enough entries for the requested sample size
-        actual_size = min(size, len(timeframe_authors))
-        
-        if actual_size > 0:
-            # Sample randomly from this timeframe
-            sample = timeframe_authors.sample(n=actual_size, random_state=42)  # Set random_state for reproducibility
-            
-            # Add to the combined sample
-            combined_sample = pd.concat([combined_sample, sample])
-            
-            print(f"Sampled {actual_size} authors from {timeframe}")
-        else:
-            print(f"No authors found for timeframe: {timeframe}")
-    
-    # Shuffle the combined sample
-    combined_sample = combined_sample.sample(frac=1, random_state=42).reset_index(drop=True)
-    
+
+    # Sample every stratum in one pass, already in random order
+    combined_sample, quotas = stratified_sample(
+        authors, STRATA, n=SAMPLE_SIZE, allocation=ALLOCATION,
+        quotas=sample_sizes, variable=NEYMAN_VARIABLE, seed=SEED
+    )
+
+    for stratum, size in quotas.items():
+        print(f"Sampled {size} authors from {stratum}")
+
+    if ALLOCATION == 'fixed':
+        for stratum in sample_sizes:
+            if stratum not in quotas.index:
+                print(f"No authors found for timeframe: {stratum}")
+
     # Save the combined sample to a new CSV file
     combined_sample.to_csv('sampled_authors.csv', index=False)
-    
+
     print(f"Total sampled authors: {len(combined_sample)}")
     print(f"Sample saved to 'sampled_authors.csv'")
-
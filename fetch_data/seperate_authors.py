@@ -1,146 +1,103 @@
-import time
-import json
-import concurrent.futures
-import requests
+import asyncio
 import pandas as pd
 import os
-from dotenv import load_dotenv
+from cache_store import BatchWriter, open_cache
+from geo_classifier import GeoClassifier
+from github_client import GitHubClient
+from github_graphql import USER_BATCH_SIZE, fetch_users, user_fields
 
-load_dotenv()
-TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {"Authorization": f"token {TOKEN}"} if TOKEN else {}
+# Input Files (set COMMIT_USERS_FILE to read another file)
+input_file = os.getenv("COMMIT_USERS_FILE", "commit_users_3.csv")
 
-# Input Files
-input_file = "commit_users_3.csv"
-cache_file = "github_locations_cache.json"
+# Load previous results (cache), migrating github_locations_cache.json on the first run
+user_data = open_cache("user_locations", "github_locations_cache.json")
 
-# Load previous results (cache)
-if os.path.exists(cache_file):
-    with open(cache_file, "r", encoding="utf-8") as f:
-        user_data = json.load(f)
-else:
-    user_data = {}
-
-# Define Sweden & UK keywords
-sweden_keywords = [
-    "Sweden", "Sverige", "Stockholm", "Gothenburg", "Malmö",
-    "Uppsala", "Lund", "Linköping", "Umeå", "Örebro", "Västerås",
-    "Helsingborg", "Norrköping", "Jönköping", "Swedish"
-]
-
-uk_keywords = [
-    "United Kingdom", "UK", "England", "Scotland", "Wales", "Northern Ireland",
-    "London", "Manchester", "Birmingham", "Edinburgh", "Glasgow", "Liverpool",
-    "Bristol", "Cardiff", "Belfast", "Leeds", "Sheffield", "Nottingham",
-    "Newcastle", "Aberdeen", "Oxford", "Cambridge", "Britain"
-]
-
-# Function to fetch user location and email
-def get_github_user_info(username):
-    if username in user_data:  # ✅ Skip if already cached
-        return user_data[username]
-
-    url = f"https://api.github.com/users/{username}"
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=5)
-
-        if response.status_code == 200:
-            data = response.json()  
-            location = data.get("location", "Unknown") 
-            email = data.get("email", "Unknown")
-
-            user_data[username] = {"location": location, "email": email}
+# Sweden & UK keywords are compiled from country_keywords.json
+geo_classifier = GeoClassifier.from_file()
 
-        elif response.status_code == 404:
-            user_data[username] = {"location": "User Not Found", "email": "User Not Found"}
+# Fetch location and email for a batch of users with one GraphQL query
+async def get_github_user_infos(client, writer, usernames, fields):
+    try:
+        # Rate limits and backoff are handled by the client from the response headers
+        users = await fetch_users(client, usernames, fields)
+    except RuntimeError as e:
+        # Leave the batch uncached so the next run retries it
+        print(f"❌ Error fetching data for {len(usernames)} users: {e}")
+        return False
+
+    # Results go through the single cache writer, which saves them in batches
+    for username, user in users.items():
+        if user is None:
+            writer.put(username, {"location": "User Not Found", "email": "User Not Found"})
+        else:
+            writer.put(username, user)
+    return True
 
-        elif response.status_code == 403:
-            print("🚨 Rate limit exceeded! Pausing for 60 minutes...")
-            time.sleep(3600)  
-            return get_github_user_info(username)  # Retry
 
-        else:
-            user_data[username] = {"location": "Unknown", "email": "Unknown"}
+async def fetch_user_infos(usernames):
+    """Fetch user info for all usernames, USER_BATCH_SIZE users per request.
+    Returns the number of batches that failed"""
+    if not usernames:
+        return 0
+    batches = [usernames[i:i + USER_BATCH_SIZE] for i in range(0, len(usernames), USER_BATCH_SIZE)]
 
-        #  Save cache every 100 users 
-        if len(user_data) % 100 == 0:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(user_data, f)
+    async with GitHubClient() as client, BatchWriter(user_data) as writer:
+        # Check the token once instead of failing every batch the same way
+        try:
+            fields = await user_fields(client)
+        except RuntimeError as e:
+            raise SystemExit(f"❌ Cannot look up user locations: {e}")
+        if "email" not in fields:
+            print("⚠️ The token lacks the user:email/read:user scope, fetching locations only (no .se email matching)")
 
-        return user_data[username]
+        # The client's in-flight limit bounds how many batches run at once
+        results = await asyncio.gather(*(get_github_user_infos(client, writer, batch, fields) for batch in batches))
 
-    except requests.exceptions.RequestException:
-        return {"location": "Unknown", "email": "Unknown"}
+    print(f"💾 Saved {writer.written} users to the location cache")
+    return results.count(False)
 
     
+# Output file suffix and display name per country of the classifier
+countries = {"sweden": "Sweden", "uk": "UK"}
+
 # Read commit users CSV file
 if os.path.exists(input_file):
     df = pd.read_csv(input_file)
 
-    # ✅ Filter users who haven't been fetched yet
-    remaining_users = [row["Username"] for _, row in df.iterrows() if row["Username"] not in user_data]
+    # ✅ Look up every distinct user in the cache at once, fetch the ones that are missing
+    usernames = [username for username in df["Username"].drop_duplicates() if isinstance(username, str)]
+    known_users = user_data.get_many(usernames)
+    remaining_users = [username for username in usernames if username not in known_users]
 
     print(f"🔍 Fetching locations for {len(remaining_users)} users (cached users skipped)...")
 
-    # Fetch locations using multiple threads (5 threads to prevent rate limit)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_user = {executor.submit(get_github_user_info, username): username for username in remaining_users}
-
-        for future in concurrent.futures.as_completed(future_to_user):
-            username = future_to_user[future]
-            try:
-                user_data[username] = future.result()
-            except Exception as e:
-                user_data[username] = {"location": "Error", "email": "Error"}
-                print(f"❌ Error fetching data for {username}: {e}")
-
-    #  Final cache save
-    with open(cache_file, "w", encoding="utf-8") as f:
-        json.dump(user_data, f)
-
-    # Separate users by country
-    sweden_authors = {}
-    uk_authors = {}
-
-    for index, row in df.iterrows():
-        repo = row["Repository"]
-        time_frame = row["Time Frame"]
-        username = row["Username"]
-
-        user_info = user_data.get(username, {"location": "Unknown", "email": "Unknown"})
-        location = user_info["location"]
-        email = user_info["email"]
-
-        if location is None:
-            location = "Unknown"
-        if email is None:
-            email = "Unknown"
-
-         # ✅ Check location OR email domain for Sweden
-        if any(keyword in location for keyword in sweden_keywords) or email.endswith(".se"):
-            if repo not in sweden_authors:
-                sweden_authors[repo] = []
-            sweden_authors[repo].append((time_frame, username, location, email))
-
-        # ✅ Check location OR email domain for the UK
-        if any(keyword in location for keyword in uk_keywords):
-            if repo not in uk_authors:
-                uk_authors[repo] = []
-            uk_authors[repo].append((time_frame, username, location, email))
-
-    # Save results for Sweden (in current directory)
-    for repo, authors in sweden_authors.items():
-        output_file = f"{repo}_authors_sweden.csv"
-        df_sweden = pd.DataFrame(authors, columns=["Time Frame", "Username", "Location", "Email"])
-        df_sweden.to_csv(output_file, index=False)
-        print(f"✅ Saved Sweden authors for {repo} to {output_file}")
-
-    # Save results for UK (in current directory)
-    for repo, authors in uk_authors.items():
-        output_file = f"{repo}_authors_uk.csv"
-        df_uk = pd.DataFrame(authors, columns=["Time Frame", "Username", "Location", "Email"])
-        df_uk.to_csv(output_file, index=False)
-        print(f"✅ Saved UK authors for {repo} to {output_file}")
+    # Fetch locations concurrently through the shared GitHub client,
+    # the cache writer has saved every result by the time this returns
+    failed_batches = asyncio.run(fetch_user_infos(remaining_users))
+    known_users.update(user_data.get_many(remaining_users))
+
+    # Join location and email onto every row, users without info are "Unknown"
+    user_info = pd.DataFrame.from_dict(known_users, orient="index", columns=["location", "email"])
+    rows = df.join(user_info, on="Username")
+    rows["Location"] = rows["location"].fillna("Unknown")
+    rows["Email"] = rows["email"].fillna("Unknown")
+
+    # ✅ Classify each distinct location/email once (Sweden also matches on a .se email)
+    matches = geo_classifier.classify_frame(rows, "Location", "Email")
+
+    # Save results per country and repository
+    for country, name in countries.items():
+        authors = rows.loc[matches[country], ["Repository", "Time Frame", "Username", "Location", "Email"]]
+        for repo, repo_authors in authors.groupby("Repository", sort=False):
+            # Next to the repository's commit results, where filtering.py reads them
+            output_file = f"{repo}/{repo}_authors/{repo}_authors_{country}.csv"
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            repo_authors.drop(columns="Repository").to_csv(output_file, index=False)
+            print(f"✅ Saved {name} authors for {repo} to {output_file}")
+
+    if failed_batches:
+        # Their users are "Unknown" above and uncached, a rerun fetches them again
+        raise SystemExit(f"❌ {failed_batches} of the user batches failed, rerun to retry them")
 
 else:
     print(f"❌ File {input_file} not found!")
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Stratified sampling of authors (or any frame).
+#
+# The frame is grouped once, every stratum gets a quota and the sample is drawn
+# in a single vectorized pass: rows are shuffled with a seeded generator and
+# the first `quota` rows of each stratum in that order are kept. Quotas can be
+#   - "fixed":        given per stratum, e.g. {"2018_2019": 24}
+#   - "proportional": n split in proportion to the stratum sizes
+#   - "neyman":       n split in proportion to size * std of a variable
+# Strata can be one column or several, e.g. ["repository", "primary_timeframe"]
+# (then fixed quotas are keyed by tuples).
+
+
+def round_quotas(exact, caps, n):
+    """Round fractional quotas to integers that sum to n (largest remainder first),
+    never giving a stratum more rows than it has"""
+    exact = np.asarray(exact, dtype=float)
+    caps = np.asarray(caps, dtype=int)
+    quotas = np.minimum(np.floor(exact), caps).astype(int)
+
+    remaining = min(n, caps.sum()) - quotas.sum()
+    while remaining > 0:
+        room = caps - quotas
+        candidates = np.flatnonzero(room > 0)
+        # Largest remainders first, ties go to the first stratum
+        candidates = candidates[np.argsort(-(exact - quotas)[candidates], kind="stable")][:remaining]
+        quotas[candidates] += 1
+        remaining -= len(candidates)
+    return quotas
+
+
+def allocate(sizes, n=None, allocation="fixed", quotas=None, stds=None):
+    """Number of rows to draw from each stratum, as a Series aligned with sizes"""
+    if allocation == "fixed":
+        wanted = pd.Series(quotas or {}, dtype="float64").reindex(sizes.index, fill_value=0).fillna(0)
+        return pd.Series(np.minimum(wanted.to_numpy(dtype=int), sizes.to_numpy()), index=sizes.index)
+
+    if n is None:
+        raise ValueError(f"{allocation} allocation needs a total sample size n")
+
+    if allocation == "proportional":
+        share = sizes.astype(float)
+    elif allocation == "neyman":
+        if stds is None:
+            raise ValueError("neyman allocation needs the per-stratum standard deviations")
+        share = sizes * stds.reindex(sizes.index).fillna(0)
+        if share.sum() == 0:
+            # No variation anywhere, fall back to proportional
+            share = sizes.astype(float)
+    else:
+        raise ValueError(f"Unknown allocation: {allocation}")
+
+    exact = share / share.sum() * min(n, sizes.sum())
+    return pd.Series(round_quotas(exact, sizes, n), index=sizes.index)
+
+
+def stratified_sample(df, by, n=None, allocation="fixed", quotas=None, variable=None, seed=42):
+    """Draw a stratified sample of df, returned in random order.
+    Returns (sample, per-stratum quotas)"""
+    by = [by] if isinstance(by, str) else list(by)
+    groups = df.groupby(by if len(by) > 1 else by[0], sort=True, observed=True)
+    sizes = groups.size()
+
+    stds = groups[variable].std(ddof=1) if allocation == "neyman" and variable else None
+    stratum_quotas = allocate(sizes, n, allocation, quotas, stds)
+
+    # Group ids follow the sorted order of sizes, rows without a stratum get -1
+    ids = groups.ngroup().to_numpy()
+    limits = np.append(stratum_quotas.to_numpy(), 0)
+
+    # Shuffle once, then keep the first `quota` rows of every stratum
+    order = np.random.default_rng(seed).permutation(len(df))
+    shuffled_ids = ids[order]
+    rank = pd.Series(shuffled_ids).groupby(shuffled_ids).cumcount().to_numpy()
+    keep = order[rank < limits[shuffled_ids]]
+
+    return df.iloc[keep].reset_index(drop=True), stratum_quotas
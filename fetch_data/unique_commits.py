@@ -1,46 +1,31 @@
 import os
-import pandas as pd
-
-repo_folders = {
-    "electron": "electron/electron_results",
-    "n8n": "n8n/n8n_results",
-    "superset": "superset/superset_results",
-    "youtube": "youtube/youtube_results",
-}
-
-time_frames = [
-    ("2018-01-01T00:00:00Z", "2019-12-31T23:59:59Z", "2018_2019"),
-    ("2020-01-01T00:00:00Z", "2022-06-30T23:59:59Z", "2020_2022"),
-    ("2022-06-01T00:00:00Z", "2024-06-30T23:59:59Z", "2022_2024"),
-]
+from commit_data import REPOS, TIMEFRAMES, commit_path, partition_path, unique_usernames
 
 unique_users = {}
 
 # Loop through each repo based on each timeframe
-for repo, folder in repo_folders.items():
-    for since, until, label in time_frames:
-        filename = os.path.join(folder, f"commits_{label}_{repo}.csv")
-
-        if os.path.exists(filename):
-            df = pd.read_csv(filename)
-
-            # Check if "Username" column exists
-            if "Username" in df.columns:
-                users = df["Username"].dropna().drop_duplicates()
-                users_list = list(users) 
+for repo in REPOS:
+    for label in TIMEFRAMES:
+        filename = commit_path(repo, label)
+
+        if os.path.exists(filename) or os.path.exists(partition_path(repo, label)):
+            try:
+                # Only the Username column is read, in chunks
+                users_list = unique_usernames(repo, label)
+            except ValueError:
+                print(f"❌ Required column 'Username' not found in {filename}")
+                continue
 
-                if users_list:
-                    unique_users[(repo, label)] = users_list
-                    print(f"✅ Extracted {len(users_list)} unique users from {filename}")
-                else:
-                    print(f"⚠️ No users found in {filename}")
+            if users_list:
+                unique_users[(repo, label)] = users_list
+                print(f"✅ Extracted {len(users_list)} unique users from {filename}")
             else:
-                print(f"❌ Required column 'Username' not found in {filename}")
+                print(f"⚠️ No users found in {filename}")
         else:
             print(f"❌ File not found: {filename}")
 
-# Save results 
-output_file = "commit_users_2.csv"
+# Save results (set COMMIT_USERS_FILE to write another file)
+output_file = os.getenv("COMMIT_USERS_FILE", "commit_users_2.csv")
 with open(output_file, "w", newline="", encoding="utf-8") as file:
     file.write("Repository,Time Frame,Username\n")
     for (repo, label), users in unique_users.items():
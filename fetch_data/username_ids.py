@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from cache_store import DB_FILE, connect
+
+# Persistent username <-> integer ID dictionary shared by the pipeline stages.
+#
+# IDs live in the `usernames` table of the cache database, keyed by the
+# lowercased login (GitHub logins are case-insensitive), so the same user gets
+# the same ID in every stage and every run. Stages encode their username
+# columns once and then join and test membership on integer arrays instead of
+# re-hashing strings.
+
+MISSING_ID = -1
+
+
+def normalize_login(login):
+    return login.strip().lower()
+
+
+class UsernameIds:
+    """Login <-> ID dictionary backed by SQLite, with an in-memory cache of the IDs used so far"""
+
+    def __init__(self, path=DB_FILE, chunk_size=500):
+        self.connection = connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS usernames (id INTEGER PRIMARY KEY, login TEXT NOT NULL UNIQUE)"
+        )
+        self.connection.commit()
+        self.chunk_size = chunk_size
+        self.by_login = {}
+
+    def _load(self, logins):
+        for start in range(0, len(logins), self.chunk_size):
+            chunk = logins[start:start + self.chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT login, id FROM usernames WHERE login IN ({placeholders})", chunk
+            )
+            self.by_login.update(rows)
+
+    def lookup(self, logins, assign=True):
+        """IDs of normalized logins as a dict, giving new logins an ID if assign is set"""
+        missing = [login for login in dict.fromkeys(logins) if login not in self.by_login]
+        if missing:
+            self._load(missing)
+            missing = [login for login in missing if login not in self.by_login]
+        if missing and assign:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO usernames (login) VALUES (?)", ((login,) for login in missing)
+                )
+            self._load(missing)
+        return {login: self.by_login[login] for login in logins if login in self.by_login}
+
+    def encode(self, usernames, assign=True):
+        """Integer IDs for a column of usernames (MISSING_ID for empty or unknown ones)"""
+        usernames = pd.Series(usernames, dtype="object")
+        normalized = usernames.where(usernames.map(lambda value: isinstance(value, str))).str.strip().str.lower()
+
+        # Look up each distinct login once, then broadcast back to the rows
+        codes, uniques = pd.factorize(normalized)
+        ids = self.lookup(list(uniques), assign)
+        table = np.array([ids.get(login, MISSING_ID) for login in uniques] + [MISSING_ID], dtype=np.int64)
+        return pd.Series(table[codes], index=usernames.index)
+
+    def decode(self, ids):
+        """Normalized logins for a list of IDs (None for unknown IDs)"""
+        ids = [int(i) for i in ids]
+        distinct = list(dict.fromkeys(ids))
+        logins = {}
+        for start in range(0, len(distinct), self.chunk_size):
+            chunk = distinct[start:start + self.chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(f"SELECT id, login FROM usernames WHERE id IN ({placeholders})", chunk)
+            logins.update(rows)
+        return [logins.get(i) for i in ids]